@@ -0,0 +1,180 @@
+import argparse
+import asyncio
+import inspect
+import socketserver
+import struct
+import threading
+from typing import Any, Callable, Dict, Iterator, Optional, Set, Tuple
+
+from src.tools.rcon import (
+    SERVERDATA_AUTH,
+    SERVERDATA_EXECCOMMAND,
+    SERVERDATA_RESPONSE_VALUE,
+    encode_packet,
+)
+
+# Minimal RCON server answering the commands sent by the exporter. Like the
+# vanilla server, each read() must hold exactly one packet or the connection is
+# closed, and responses longer than a packet are split.
+
+MAX_PAYLOAD = 4096
+# read buffer of the vanilla server
+MAX_PACKET = 1460
+HEADER = struct.Struct("<iii")
+
+
+def responses(players: int, online: int, mods: int) -> Dict[str, str]:
+    names = ", ".join(f"player{i}" for i in range(online))
+    entities = "\n".join(f"  {i + 1}: mod{i % 5}:entity_{i}" for i in range(200))
+    mod_list = "\n".join(f"mod{i}: mod{i} (1.0.{i})" for i in range(mods))
+    return {
+        "/list": f"There are {online} of a max of {players} players online: {names}",
+        "/forge entity list": f"Total: 200\n{entities}",
+        "/forge mods": f"Mod List:\n{mod_list}",
+    }
+
+
+def read_packet(data: bytes) -> Optional[Tuple[int, int, str]]:
+    # None when the data of a read() is several packets or a partial one
+    if len(data) < HEADER.size + 2:
+        return None
+    length, request_id, packet_type = HEADER.unpack_from(data)
+    if length != len(data) - 4:
+        return None
+    return request_id, packet_type, data[HEADER.size : -2].decode()
+
+
+def answer(
+    password: str, request_id: int, packet_type: int, payload: str, response: str
+) -> Iterator[bytes]:
+    # response is the result of the command for SERVERDATA_EXECCOMMAND packets
+    if packet_type == SERVERDATA_AUTH:
+        authenticated = payload == password
+        yield encode_packet(request_id if authenticated else -1, 2, "")
+    elif packet_type == SERVERDATA_EXECCOMMAND:
+        for i in range(0, max(len(response), 1), MAX_PAYLOAD):
+            yield encode_packet(
+                request_id, SERVERDATA_RESPONSE_VALUE, response[i : i + MAX_PAYLOAD]
+            )
+    else:
+        # the end marker of split responses
+        yield encode_packet(
+            request_id, SERVERDATA_RESPONSE_VALUE, f"Unknown request {packet_type:x}"
+        )
+
+
+class RconHandler(socketserver.BaseRequestHandler):
+    server: "FakeRconServer"
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        try:
+            while data := self.request.recv(MAX_PACKET):
+                if (packet := read_packet(data)) is None:
+                    server.rejected += 1
+                    break
+                _, packet_type, payload = packet
+                response = ""
+                if packet_type == SERVERDATA_EXECCOMMAND:
+                    server.commands += 1
+                    response = server.respond(payload)
+                for data in answer(server.password, *packet, response):
+                    self.request.sendall(data)
+        except OSError:
+            pass
+
+
+class FakeRconServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port: int, password: str, respond: Callable[[str], str]):
+        super().__init__(("127.0.0.1", port), RconHandler)
+        self.password = password
+        self.respond = respond
+        self.connections = 0
+        self.commands = 0
+        self.rejected = 0
+
+    def start(self) -> "FakeRconServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class AsyncFakeRconServer:
+    # In-process asyncio variant for the tests of the asyncio client, respond
+    # may be a coroutine function to delay or hang a command.
+
+    def __init__(self, password: str, respond: Callable[[str], Any]):
+        self.password = password
+        self.respond = respond
+        self.port = 0
+        self.connections = 0
+        self.commands = 0
+        self.rejected = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writers: Set[asyncio.StreamWriter] = set()
+
+    async def start(self, port: int = 0) -> "AsyncFakeRconServer":
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    def drop_connections(self):
+        for writer in self._writers:
+            writer.close()
+
+    async def close(self):
+        self.drop_connections()
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer):
+        self.connections += 1
+        self._writers.add(writer)
+        try:
+            while data := await reader.read(MAX_PACKET):
+                if (packet := read_packet(data)) is None:
+                    self.rejected += 1
+                    break
+                _, packet_type, payload = packet
+                response = ""
+                if packet_type == SERVERDATA_EXECCOMMAND:
+                    self.commands += 1
+                    response = self.respond(payload)
+                    if inspect.isawaitable(response):
+                        response = await response
+                writer.writelines(answer(self.password, *packet, response))
+                await writer.drain()
+        except OSError:
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+
+def serve(
+    port: int = 0, password: str = "password", players=1000, online=50, mods=100
+) -> FakeRconServer:
+    # port 0 picks a free port, read it from server.server_address
+    table = responses(players, online, mods)
+    return FakeRconServer(
+        port, password, lambda command: table.get(command, "Unknown command")
+    ).start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake RCON server")
+    parser.add_argument("--port", type=int, default=25575)
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--online", type=int, default=50)
+    parser.add_argument("--mods", type=int, default=100)
+    args = parser.parse_args()
+    server = serve(args.port, args.password, args.players, args.online, args.mods)
+    print(f"Fake RCON listening on [{server.server_address[1]}]")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,358 @@
+import argparse
+import gzip
+import json
+import os
+import random
+import struct
+import uuid
+import zlib
+from time import time
+from typing import Any, Dict, List, Tuple
+
+from src.tools.nbt_reader import (
+    TAG_BYTE,
+    TAG_BYTE_ARRAY,
+    TAG_COMPOUND,
+    TAG_DOUBLE,
+    TAG_END,
+    TAG_FLOAT,
+    TAG_INT,
+    TAG_INT_ARRAY,
+    TAG_LIST,
+    TAG_LONG,
+    TAG_LONG_ARRAY,
+    TAG_SHORT,
+    TAG_STRING,
+)
+
+# Writes a fake server root: usercache.json, stats (pre and post 1.13 formats),
+# gzipped NBT playerdata, level.dat and optionally region files (1.18 layout).
+# Same seed, same world.
+
+CATEGORIES = (
+    "mined",
+    "broken",
+    "crafted",
+    "used",
+    "picked_up",
+    "dropped",
+    "killed",
+    "killed_by",
+)
+
+CUSTOM = (
+    "jump",
+    "deaths",
+    "leave_game",
+    "mob_kills",
+    "damage_dealt",
+    "damage_taken",
+    "fish_caught",
+    "animals_bred",
+    "sleep_in_bed",
+    "traded_with_villager",
+    "open_chest",
+    "open_barrel",
+    "bell_ring",
+    "enchant_item",
+    "play_time",
+    "sneak_time",
+    "time_since_death",
+    "time_since_rest",
+    "walk_one_cm",
+    "sprint_one_cm",
+    "swim_one_cm",
+    "fall_one_cm",
+    "fly_one_cm",
+    "interact_with_crafting_table",
+    "interact_with_furnace",
+    "clean_armor",
+)
+
+# pre 1.13 names of the stats above, "{}" is replaced by "<mod>.<item>"
+CATEGORIES_OLD = {
+    "mined": "mineBlock",
+    "broken": "breakItem",
+    "crafted": "craftItem",
+    "used": "useItem",
+    "picked_up": "pickup",
+    "dropped": "drop",
+    "killed": "killEntity",
+    "killed_by": "entityKilledBy",
+}
+
+CUSTOM_OLD = (
+    "jump",
+    "deaths",
+    "leaveGame",
+    "mobKills",
+    "damageDealt",
+    "damageTaken",
+    "fishCaught",
+    "animalsBred",
+    "sleepInBed",
+    "tradedWithVillager",
+    "chestOpened",
+    "itemEnchanted",
+    "playOneMinute",
+    "sneakTime",
+    "timeSinceDeath",
+    "walkOneCm",
+    "sprintOneCm",
+    "swimOneCm",
+    "fallOneCm",
+    "flyOneCm",
+    "craftingTableInteraction",
+    "furnaceInteraction",
+    "armorCleaned",
+)
+
+# NBT values are (tag type, value), lists are (TAG_LIST, (item type, [values]))
+Tag = Tuple[int, Any]
+
+_NUMBERS = {
+    TAG_BYTE: ">b",
+    TAG_SHORT: ">h",
+    TAG_INT: ">i",
+    TAG_LONG: ">q",
+    TAG_FLOAT: ">f",
+    TAG_DOUBLE: ">d",
+}
+_ARRAYS = {TAG_BYTE_ARRAY: "b", TAG_INT_ARRAY: "i", TAG_LONG_ARRAY: "q"}
+
+
+def _payload(tag_type: int, value: Any) -> bytes:
+    if tag_type in _NUMBERS:
+        return struct.pack(_NUMBERS[tag_type], value)
+    if tag_type == TAG_STRING:
+        data = value.encode()
+        return struct.pack(">H", len(data)) + data
+    if tag_type in _ARRAYS:
+        return struct.pack(f">i{len(value)}{_ARRAYS[tag_type]}", len(value), *value)
+    if tag_type == TAG_LIST:
+        item_type, items = value
+        return struct.pack(">bi", item_type, len(items)) + b"".join(
+            _payload(item_type, item) for item in items
+        )
+    if tag_type == TAG_COMPOUND:
+        return b"".join(_named(name, tag) for name, tag in value.items()) + bytes(
+            (TAG_END,)
+        )
+    raise ValueError(f"Unsupported tag type [{tag_type}]")
+
+
+def _named(name: str, tag: Tag) -> bytes:
+    tag_type, value = tag
+    return bytes((tag_type,)) + _payload(TAG_STRING, name) + _payload(tag_type, value)
+
+
+def write_nbt(path: str, root: Dict[str, Tag]):
+    with gzip.open(path, "wb") as fd:
+        fd.write(_named("", (TAG_COMPOUND, root)))
+
+
+def write_region(path: str, chunks: Dict[int, Dict[str, Tag]], timestamp: int):
+    # chunks by index in the region (0-1023), zlib compressed
+    locations, sectors = [0] * 1024, []
+    offset = 2
+    for index, root in chunks.items():
+        data = zlib.compress(_named("", (TAG_COMPOUND, root)))
+        data = struct.pack(">IB", len(data) + 1, 2) + data
+        count = -(-len(data) // 4096)
+        sectors.append(data.ljust(count * 4096, b"\0"))
+        locations[index] = offset << 8 | count
+        offset += count
+    timestamps = [timestamp if location else 0 for location in locations]
+    with open(path, "wb") as fd:
+        fd.write(struct.pack(">1024I1024I", *locations, *timestamps))
+        fd.writelines(sectors)
+
+
+def _entity(rng: random.Random, name: str) -> Dict[str, Tag]:
+    return {
+        "id": (TAG_STRING, f"minecraft:{name}"),
+        "Pos": (TAG_LIST, (TAG_DOUBLE, [rng.uniform(-1e4, 1e4) for _ in range(3)])),
+    }
+
+
+def generate_regions(
+    world: str, rng: random.Random, regions: int, chunks: int, spread_days: float
+):
+    region_path, entities_path = f"{world}/region", f"{world}/entities"
+    os.makedirs(region_path, exist_ok=True)
+    os.makedirs(entities_path, exist_ok=True)
+    for index in range(regions):
+        name = f"r.{index}.0.mca"
+        timestamp = int(time() - rng.uniform(0, spread_days * 86400))
+        blocks, entities = {}, {}
+        for chunk in rng.sample(range(1024), chunks):
+            blocks[chunk] = {
+                "DataVersion": (TAG_INT, 2975),
+                "Status": (TAG_STRING, "full"),
+                "block_entities": (
+                    TAG_LIST,
+                    (TAG_COMPOUND, [_entity(rng, "chest") for _ in range(chunk % 3)]),
+                ),
+            }
+            entities[chunk] = {
+                "DataVersion": (TAG_INT, 2975),
+                "Entities": (
+                    TAG_LIST,
+                    (TAG_COMPOUND, [_entity(rng, "cow") for _ in range(chunk % 5)]),
+                ),
+            }
+        write_region(f"{region_path}/{name}", blocks, timestamp)
+        write_region(f"{entities_path}/{name}", entities, timestamp)
+
+
+def _items(rng: random.Random, mods: int, items: int) -> List[Tuple[str, str]]:
+    namespaces = ["minecraft"] + [f"mod{i}" for i in range(mods)]
+    return [(mod, f"item_{i}") for mod in namespaces for i in range(items)]
+
+
+def stats_after_1_13(rng: random.Random, items, keys: int) -> Dict:
+    stats = {f"minecraft:{category}": {} for category in CATEGORIES}
+    stats["minecraft:custom"] = {
+        f"minecraft:{name}": rng.randrange(1, 100000) for name in CUSTOM
+    }
+    for _ in range(max(0, keys - len(CUSTOM))):
+        mod, item = rng.choice(items)
+        category = stats[f"minecraft:{rng.choice(CATEGORIES)}"]
+        category[f"{mod}:{item}"] = rng.randrange(1, 10000)
+    return {"stats": stats, "DataVersion": 2586}
+
+
+def stats_before_1_13(rng: random.Random, items, keys: int) -> Dict:
+    stats = {f"stat.{name}": rng.randrange(1, 100000) for name in CUSTOM_OLD}
+    for _ in range(max(0, keys - len(CUSTOM_OLD))):
+        mod, item = rng.choice(items)
+        category = CATEGORIES_OLD[rng.choice(CATEGORIES)]
+        stats[f"stat.{category}.{mod}.{item}"] = rng.randrange(1, 10000)
+    return stats
+
+
+def player_data(rng: random.Random, index: int) -> Dict[str, Tag]:
+    # the exported tags and a few big ones the reader has to skip
+    return {
+        "DataVersion": (TAG_INT, 2586),
+        "Pos": (TAG_LIST, (TAG_DOUBLE, [rng.uniform(-1e4, 1e4) for _ in range(3)])),
+        "Inventory": (
+            TAG_LIST,
+            (
+                TAG_COMPOUND,
+                [
+                    {
+                        "Slot": (TAG_BYTE, slot),
+                        "id": (TAG_STRING, "minecraft:stone"),
+                        "Count": (TAG_BYTE, rng.randrange(1, 64)),
+                    }
+                    for slot in range(36)
+                ],
+            ),
+        ),
+        "UUID": (TAG_LONG_ARRAY, [rng.getrandbits(63) for _ in range(2)]),
+        "foodLevel": (TAG_INT, rng.randrange(0, 21)),
+        "foodSaturationLevel": (TAG_FLOAT, rng.uniform(0, 20)),
+        "Health": (TAG_FLOAT, rng.uniform(0, 20)),
+        "Score": (TAG_INT, index),
+        "XpLevel": (TAG_INT, rng.randrange(0, 100)),
+        "XpTotal": (TAG_INT, rng.randrange(0, 100000)),
+    }
+
+
+def level_data() -> Dict[str, Tag]:
+    return {
+        "Data": (
+            TAG_COMPOUND,
+            {
+                "LevelName": (TAG_STRING, "world"),
+                "Version": (
+                    TAG_COMPOUND,
+                    {"Name": (TAG_STRING, "1.16.5"), "Id": (TAG_INT, 2586)},
+                ),
+                "Difficulty": (TAG_BYTE, 2),
+                "GameType": (TAG_INT, 0),
+                "hardcore": (TAG_BYTE, 0),
+                "Time": (TAG_LONG, 123456789),
+            },
+        )
+    }
+
+
+def generate(
+    root: str,
+    players: int,
+    keys: int = 300,
+    old_ratio: float = 0.1,
+    mods: int = 5,
+    items: int = 200,
+    spread_days: float = 0,
+    seed: int = 0,
+    regions: int = 0,
+    chunks: int = 256,
+):
+    rng = random.Random(seed)
+    stats_path = f"{root}/world/stats"
+    player_data_path = f"{root}/world/playerdata"
+    os.makedirs(stats_path, exist_ok=True)
+    os.makedirs(player_data_path, exist_ok=True)
+
+    item_pool = _items(rng, mods, items)
+    users = []
+    for index in range(players):
+        player_uuid = str(uuid.UUID(int=rng.getrandbits(128)))
+        users.append(
+            {
+                "name": f"player{index}",
+                "uuid": player_uuid,
+                "expiresOn": "2030-01-01 00:00:00 +0000",
+            }
+        )
+        if rng.random() < old_ratio:
+            stats = stats_before_1_13(rng, item_pool, keys)
+        else:
+            stats = stats_after_1_13(rng, item_pool, keys)
+        path = f"{stats_path}/{player_uuid}.json"
+        with open(path, "w") as fd:
+            json.dump(stats, fd)
+        if spread_days:
+            mtime = time() - rng.uniform(0, spread_days * 86400)
+            os.utime(path, (mtime, mtime))
+        write_nbt(f"{player_data_path}/{player_uuid}.dat", player_data(rng, index))
+
+    with open(f"{root}/usercache.json", "w") as fd:
+        json.dump(users, fd)
+    write_nbt(f"{root}/world/level.dat", level_data())
+    if regions:
+        generate_regions(f"{root}/world", rng, regions, chunks, spread_days)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a fake minecraft server root")
+    parser.add_argument("root")
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--keys", type=int, default=300, help="stats per player")
+    parser.add_argument(
+        "--old-ratio", type=float, default=0.1, help="share of pre 1.13 stats files"
+    )
+    parser.add_argument("--mods", type=int, default=5, help="modded namespaces")
+    parser.add_argument("--items", type=int, default=200, help="items per namespace")
+    parser.add_argument(
+        "--spread-days", type=float, default=0, help="spread stats files mtime"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--regions", type=int, default=0, help="overworld regions")
+    parser.add_argument("--chunks", type=int, default=256, help="chunks per region")
+    args = parser.parse_args()
+    generate(
+        args.root,
+        args.players,
+        args.keys,
+        args.old_ratio,
+        args.mods,
+        args.items,
+        args.spread_days,
+        args.seed,
+        args.regions,
+        args.chunks,
+    )
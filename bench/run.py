@@ -0,0 +1,169 @@
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tracemalloc
+from statistics import median
+from time import perf_counter
+from typing import Dict, List
+
+# Each size runs in fresh processes, so "cold" is a real first collection:
+# empty caches and indexes, nothing interned. Allocations are traced in a
+# separate process because tracemalloc slows everything down.
+
+SIZES = (100, 1000, 10000)
+
+
+def _child(root: str, repeat: int, trace: bool, rcon_async: bool) -> Dict:
+    # imported here, the parent process never loads the exporter
+    from bench.fake_rcon import serve
+    from src.core.sources import (
+        collect_level,
+        collect_players,
+        collect_rcon,
+        collect_rcon_async,
+    )
+    from src.core.target import Target
+    from src.tools.exposition import encode_families
+
+    rcon = serve()
+    target = Target(
+        "bench",
+        root,
+        forge=True,
+        rcon_host="127.0.0.1",
+        rcon_port=rcon.server_address[1],
+        rcon_password="password",
+    )
+    loop = asyncio.new_event_loop()
+
+    def collect_all():
+        rcon_families = (
+            loop.run_until_complete(collect_rcon_async(target))
+            if rcon_async
+            else collect_rcon(target)
+        )
+        return (
+            tuple(collect_players(target)),
+            tuple(collect_level(target)),
+            tuple(rcon_families),
+        )
+
+    if trace:
+        tracemalloc.start()
+        encode_families(sum(collect_all(), ()))
+        current, peak = tracemalloc.get_traced_memory()
+        return {"retained_bytes": current, "peak_traced_bytes": peak}
+
+    result = {}
+    start = perf_counter()
+    families = collect_all()
+    result["cold_collect_s"] = perf_counter() - start
+    start = perf_counter()
+    encoded = encode_families(sum(families, ()))
+    result["cold_encode_s"] = perf_counter() - start
+    result["exposition_bytes"] = len(encoded.text)
+    result["exposition_gzip_bytes"] = len(encoded.gzipped)
+    result["series"] = encoded.text.count(b"\n") - 2 * len(encoded.index)
+
+    times = {"players": [], "level": [], "rcon": [], "encode": []}
+    for _ in range(repeat):
+        for name, collect in (
+            ("players", lambda: tuple(collect_players(target))),
+            ("level", lambda: tuple(collect_level(target))),
+            (
+                "rcon",
+                lambda: tuple(
+                    loop.run_until_complete(collect_rcon_async(target))
+                    if rcon_async
+                    else collect_rcon(target)
+                ),
+            ),
+        ):
+            start = perf_counter()
+            collect()
+            times[name].append(perf_counter() - start)
+        families = collect_all()
+        start = perf_counter()
+        encoded = encode_families(sum(families, ()), encoded)
+        times["encode"].append(perf_counter() - start)
+    for name, values in times.items():
+        result[f"warm_{name}_s"] = median(values)
+    # kilobytes on Linux
+    result["peak_rss_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    result["rcon_connections"] = rcon.connections
+    return result
+
+
+def _run_child(root: str, args, trace: bool) -> Dict:
+    command = [sys.executable, "-m", "bench.run", "--child", root]
+    command += ["--repeat", str(args.repeat)]
+    command += ["--trace"] if trace else []
+    command += ["--rcon-async"] if args.rcon_async else []
+    env = {**os.environ, "WARMUP_WORKERS": "1"}
+    output = subprocess.run(
+        command, check=True, capture_output=True, text=True, env=env
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def world(args, players: int) -> str:
+    from bench.genworld import generate
+
+    root = os.path.join(args.workdir, f"world-{players}-{args.keys}-{args.seed}")
+    if not os.path.exists(os.path.join(root, "usercache.json")):
+        print(f"Generating [{root}]", file=sys.stderr)
+        generate(root, players, keys=args.keys, seed=args.seed)
+    return root
+
+
+def report(results: List[Dict]):
+    # one column per size
+    for name in results[0]:
+        values = (result[name] for result in results)
+        print(
+            f"{name:<24}"
+            + "".join(
+                f"{value:>14.4f}" if isinstance(value, float) else f"{value:>14}"
+                for value in values
+            )
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the collection pipeline")
+    parser.add_argument(
+        "--sizes", default=",".join(map(str, SIZES)), help="players, comma separated"
+    )
+    parser.add_argument("--keys", type=int, default=300, help="stats per player")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5, help="warm collections")
+    parser.add_argument("--rcon-async", action="store_true")
+    parser.add_argument("--workdir", default="/tmp/minepy-bench")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--trace", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(_child(args.child, args.repeat, args.trace, args.rcon_async)))
+        return
+
+    results = []
+    for players in map(int, args.sizes.split(",")):
+        root = world(args, players)
+        result = {"players": players}
+        result.update(_run_child(root, args, trace=False))
+        result.update(_run_child(root, args, trace=True))
+        results.append(result)
+    report(results)
+    if args.json:
+        with open(args.json, "w") as fd:
+            json.dump(results, fd, indent=2)
+
+
+if __name__ == "__main__":
+    main()
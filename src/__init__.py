@@ -5,8 +5,41 @@ __all__ = [
     "RCON_HOST",
     "RCON_PORT",
     "RCON_ENABLED",
+    "RCON_POOL_SIZE",
+    "RCON_TIMEOUT",
+    "RCON_ASYNC",
     "ROOT_PATH",
     "FORGE_SERVER",
+    "PLAYERS_REFRESH_INTERVAL",
+    "LEVEL_REFRESH_INTERVAL",
+    "RCON_REFRESH_INTERVAL",
+    "ADVANCEMENTS_REFRESH_INTERVAL",
+    "CHANGE_DETECTION",
+    "FILE_CACHE_MAX_ENTRIES",
+    "FILE_CACHE_MAX_BYTES",
+    "FILE_CACHE_TTL",
+    "WARMUP_WORKERS",
+    "WARMUP_CHUNK_SIZE",
+    "SCRAPE_MIN_INTERVAL",
+    "STATS_ACTIVE_DAYS",
+    "STATS_ALLOW",
+    "STATS_DENY",
+    "STATS_TOP_ITEMS",
+    "TARGETS_FILE",
+    "PROFILE_TOKEN",
+    "STATE_FILE",
+    "STATE_SAVE_INTERVAL",
+    "LOG_TAIL",
+    "LOG_REFRESH_INTERVAL",
+    "LOG_RECONCILE_INTERVAL",
+    "REGION_SCAN",
+    "REGION_REFRESH_INTERVAL",
+    "REGION_RECENT_SECONDS",
+    "REGION_ENTITIES",
+    "REGION_SAMPLE_INTERVAL",
+    "SHARD_INDEX",
+    "SHARD_COUNT",
+    "JSON_DECODER",
 ]
 
 ROOT_PATH = "/minecraft"
@@ -16,5 +49,62 @@ FORGE_SERVER = bool(os.getenv("FORGE_SERVER", False))
 RCON_PASSWORD = os.getenv("RCON_PASSWORD", None)
 RCON_HOST = os.getenv("RCON_HOST", None)
 RCON_PORT = int(os.getenv("RCON_PORT", 25575))
+RCON_POOL_SIZE = int(os.getenv("RCON_POOL_SIZE", 2))
+RCON_TIMEOUT = float(os.getenv("RCON_TIMEOUT", 5))
+RCON_ASYNC = bool(os.getenv("RCON_ASYNC", False))
 
 RCON_ENABLED = RCON_PASSWORD and RCON_HOST
+
+# json file describing several servers, replaces the variables above
+TARGETS_FILE = os.getenv("TARGETS_FILE", None)
+
+PLAYERS_REFRESH_INTERVAL = float(os.getenv("PLAYERS_REFRESH_INTERVAL", 15))
+LEVEL_REFRESH_INTERVAL = float(os.getenv("LEVEL_REFRESH_INTERVAL", 60))
+RCON_REFRESH_INTERVAL = float(os.getenv("RCON_REFRESH_INTERVAL", 15))
+ADVANCEMENTS_REFRESH_INTERVAL = float(os.getenv("ADVANCEMENTS_REFRESH_INTERVAL", 30))
+
+# players online from logs/latest.log, RCON only reconciles them
+LOG_TAIL = bool(os.getenv("LOG_TAIL", False))
+LOG_REFRESH_INTERVAL = float(os.getenv("LOG_REFRESH_INTERVAL", 0.5))
+LOG_RECONCILE_INTERVAL = float(os.getenv("LOG_RECONCILE_INTERVAL", 600))
+
+# chunk counts from the region files headers, entities sampled one file per tick
+REGION_SCAN = bool(os.getenv("REGION_SCAN", False))
+REGION_REFRESH_INTERVAL = float(os.getenv("REGION_REFRESH_INTERVAL", 60))
+REGION_RECENT_SECONDS = float(os.getenv("REGION_RECENT_SECONDS", 3600))
+REGION_ENTITIES = bool(os.getenv("REGION_ENTITIES", False))
+REGION_SAMPLE_INTERVAL = float(os.getenv("REGION_SAMPLE_INTERVAL", 1))
+
+CHANGE_DETECTION = os.getenv("CHANGE_DETECTION", "poll")
+
+FILE_CACHE_MAX_ENTRIES = int(os.getenv("FILE_CACHE_MAX_ENTRIES", 1024))
+FILE_CACHE_MAX_BYTES = int(os.getenv("FILE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+FILE_CACHE_TTL = float(os.getenv("FILE_CACHE_TTL", 0))
+
+# "auto" uses orjson when installed, "orjson" warns when it is not, "stdlib"
+# forces the json module
+JSON_DECODER = os.getenv("JSON_DECODER", "auto")
+
+# cpu_count() is the host's in a container, each worker is an interpreter
+WARMUP_WORKERS = int(os.getenv("WARMUP_WORKERS", min(4, os.cpu_count() or 1)))
+WARMUP_CHUNK_SIZE = int(os.getenv("WARMUP_CHUNK_SIZE", 256))
+
+SCRAPE_MIN_INTERVAL = float(os.getenv("SCRAPE_MIN_INTERVAL", 0))
+
+STATS_ACTIVE_DAYS = float(os.getenv("STATS_ACTIVE_DAYS", 0))
+STATS_ALLOW = os.getenv("STATS_ALLOW", "")
+STATS_DENY = os.getenv("STATS_DENY", "")
+STATS_TOP_ITEMS = int(os.getenv("STATS_TOP_ITEMS", 0))
+
+# enables /debug/profile, requests must give it as ?token= or a Bearer header
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", None)
+
+# SQLite file keeping the parsed players files and the last snapshots across
+# restarts, disabled when unset
+STATE_FILE = os.getenv("STATE_FILE", None)
+STATE_SAVE_INTERVAL = float(os.getenv("STATE_SAVE_INTERVAL", 300))
+
+# players split between SHARD_COUNT exporters by uuid, server wide metrics are
+# only exported by the shard 0
+SHARD_INDEX = int(os.getenv("SHARD_INDEX", 0))
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", 1))
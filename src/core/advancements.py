@@ -0,0 +1,155 @@
+from array import array
+from datetime import datetime
+from typing import Iterator, List, NamedTuple, Optional, Set
+
+from prometheus_client.metrics_core import GaugeMetricFamily
+
+from src.core.datasource import change_watcher
+from src.core.players import PlayerRegistry, ShardFilter
+from src.tools.file_index import DirectoryIndex
+from src.tools.intern_table import InternTable, grow
+from src.tools.json_reader import read_json
+
+# advancements unlocking recipes, hundreds per player and no progress meaning
+RECIPES = "recipes/"
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S %z"
+
+
+# global table of the advancement names seen in any player file, the id of a
+# name is its bit in PlayerAdvancements.done
+advancement_ids: InternTable[str] = InternTable()
+
+
+class PlayerAdvancements(NamedTuple):
+    # bit set of the completed advancements and their completion times (unix
+    # seconds) in the order of the set bits
+    done: int
+    count: int
+    times: array
+
+
+def bits(value: int) -> Iterator[int]:
+    while value:
+        low = value & -value
+        yield low.bit_length() - 1
+        value ^= low
+
+
+def parse_advancements(path: str) -> PlayerAdvancements:
+    completed = []
+    for name, progress in (read_json(path) or {}).items():
+        if not isinstance(progress, dict) or not progress.get("done"):
+            continue
+        if RECIPES in name:
+            continue
+        # completed when its last criterion was
+        criteria = progress.get("criteria") or {}
+        time = (
+            int(datetime.strptime(max(criteria.values()), TIME_FORMAT).timestamp())
+            if criteria
+            else 0
+        )
+        completed.append((advancement_ids.intern(name), time))
+    completed.sort()
+    done = 0
+    for advancement_id, _ in completed:
+        done |= 1 << advancement_id
+    return PlayerAdvancements(
+        done, len(completed), array("q", (time for _, time in completed))
+    )
+
+
+class AdvancementTotals:
+    # Players having completed each advancement and the first completion time,
+    # kept up to date by the advancements index as player files change.
+
+    def __init__(self, ids: InternTable[str]):
+        self.ids = ids
+        self.players = array("q")
+        # 0 when unknown, recomputed from every player when its holder changed
+        self.first = array("q")
+        self._stale: Set[int] = set()
+
+    def update(
+        self,
+        _,
+        previous: Optional[PlayerAdvancements],
+        new: Optional[PlayerAdvancements],
+    ):
+        grow(len(self.ids), self.players, self.first)
+        before = dict(zip(bits(previous.done), previous.times)) if previous else {}
+        after = dict(zip(bits(new.done), new.times)) if new else {}
+        for advancement_id in before.keys() - after.keys():
+            self.players[advancement_id] -= 1
+        for advancement_id in after.keys() - before.keys():
+            self.players[advancement_id] += 1
+        for advancement_id, time in before.items():
+            if time == self.first[advancement_id] and after.get(advancement_id) != time:
+                self._stale.add(advancement_id)
+        for advancement_id, time in after.items():
+            first = self.first[advancement_id]
+            if time and (not first or time < first):
+                self.first[advancement_id] = time
+                self._stale.discard(advancement_id)
+
+    def refresh_first(self, index: DirectoryIndex):
+        # only when a player holding a first completion lost it (revoked or
+        # file removed), rare enough to scan every player
+        if not self._stale:
+            return
+        stale, self._stale = self._stale, set()
+        for advancement_id in stale:
+            self.first[advancement_id] = 0
+        for _, advancements in index.items():
+            for advancement_id, time in zip(
+                bits(advancements.done), advancements.times
+            ):
+                first = self.first[advancement_id]
+                if advancement_id in stale and time and (not first or time < first):
+                    self.first[advancement_id] = time
+
+
+def make_advancements_index(
+    world: str, totals: AdvancementTotals, accept: ShardFilter = None
+) -> DirectoryIndex:
+    return DirectoryIndex(
+        f"{world}/advancements",
+        ".json",
+        parse_advancements,
+        change_watcher,
+        on_update=totals.update,
+        accept=accept,
+    )
+
+
+def advancements_metrics(target, players: PlayerRegistry) -> List[GaugeMetricFamily]:
+    index, totals = target.advancements_index, target.advancement_totals
+    index.refresh()
+    totals.refresh_first(index)
+
+    per_player = GaugeMetricFamily(
+        "mc_player_advancements",
+        "Give advancements completed by the player, recipes excluded",
+        labels=("player",),
+    )
+    for player in players.local:
+        if advancements := index.get(player.uuid):
+            per_player.add_metric(player.labels, advancements.count)
+
+    completed = GaugeMetricFamily(
+        "mc_server_advancement_players",
+        "Give players who completed the advancement",
+        labels=("advancement",),
+    )
+    first = GaugeMetricFamily(
+        "mc_server_advancement_first_completed_timestamp_seconds",
+        "Give when the advancement was first completed on the server",
+        labels=("advancement",),
+    )
+    names = advancement_ids.keys
+    for advancement_id, count in enumerate(totals.players):
+        if count:
+            completed.add_metric((names[advancement_id],), count)
+            if time := totals.first[advancement_id]:
+                first.add_metric((names[advancement_id],), time)
+    return [per_player, completed, first]
@@ -1,54 +1,83 @@
-import json
+import asyncio
 import logging
-from typing import Dict, List
+import threading
+from typing import Optional
 
 from cachetools import cached, TTLCache
 from cachetools.func import ttl_cache
-from mcrcon import MCRcon, MCRconException
-from nbt import nbt
+from cachetools.keys import hashkey
 
-from src import ROOT_PATH, RCON_HOST, RCON_PASSWORD, RCON_PORT
+from src import (
+    CHANGE_DETECTION,
+    FILE_CACHE_MAX_ENTRIES,
+    FILE_CACHE_MAX_BYTES,
+    FILE_CACHE_TTL,
+)
+from src.core.players import PlayerRegistry
 from src.tools.file_cache import JsonFileCache, NbtFileCache
+from src.tools.inotify import InotifyWatcher
+from src.tools.instrumentation import RCON_DURATION
+from src.tools.rcon import RconError
 
-json_file_cache = JsonFileCache()
-nbt_file_cache = NbtFileCache()
+change_watcher = InotifyWatcher.create() if CHANGE_DETECTION == "inotify" else None
 
+LEVEL_DATA_TAGS = (
+    "Data.Version.Name",
+    "Data.Difficulty",
+    "Data.GameType",
+    "Data.hardcore",
+)
 
-def rcon_command(command: str):
-    try:
-        with MCRcon(host=RCON_HOST, password=RCON_PASSWORD, port=RCON_PORT) as rcon:
-            return rcon.command(f"/{command}")
-    except (MCRconException, OSError) as e:
-        logging.error(f"Connection to RCON failed: {e}")
+file_cache_options = dict(
+    watcher=change_watcher,
+    max_entries=FILE_CACHE_MAX_ENTRIES,
+    max_bytes=FILE_CACHE_MAX_BYTES,
+    ttl=FILE_CACHE_TTL,
+)
+json_file_cache = JsonFileCache(**file_cache_options)
+level_data_cache = NbtFileCache(LEVEL_DATA_TAGS, **file_cache_options)
+
+# functions taking a target read the server described by a src.core.target.Target
 
 
-def load_players() -> List[Dict[str, str]]:
-    return json_file_cache[f"{ROOT_PATH}/usercache.json"] or []
+def rcon_command(target, command: str) -> Optional[str]:
+    with RCON_DURATION.labels(command).time():
+        return target.rcon_pool.command(f"/{command}")
 
 
-def load_player_stats(uuid: str):
-    return json_file_cache[f"{ROOT_PATH}/world/stats/{uuid}.json"] or {}
+async def async_rcon_command(target, command: str) -> Optional[str]:
+    try:
+        with RCON_DURATION.labels(command).time():
+            return await target.async_rcon_client.command(f"/{command}")
+    except (OSError, RconError, asyncio.TimeoutError) as e:
+        logging.error(f"RCON command [{command}] of [{target.name}] failed: {e!r}")
 
 
-def load_player_data(uuid: str):
-    return nbt_file_cache[f"{ROOT_PATH}/world/playerdata/{uuid}.dat"]
+def load_players(target) -> PlayerRegistry:
+    # the registry is only rebuilt when usercache.json changed
+    return target.players.update(json_file_cache[f"{target.root}/usercache.json"] or [])
 
 
-def load_level_data():
-    return nbt_file_cache[f"{ROOT_PATH}/world/level.dat"]
+def load_level_data(target):
+    return level_data_cache[f"{target.world}/level.dat"]
 
 
-@cached(cache=TTLCache(maxsize=1, ttl=600))
-def get_server_properties():
+# shared by the level source of every target
+@cached(
+    cache=TTLCache(maxsize=256, ttl=600),
+    key=lambda target: hashkey(target.root),
+    lock=threading.Lock(),
+)
+def get_server_properties(target):
     try:
-        with open(f"{ROOT_PATH}/server.properties", "r") as f:
+        with open(f"{target.root}/server.properties", "r") as f:
             properties = {}
             for line in f:
                 if "=" in line:
                     key, value = line.split("=")
                     properties[key] = value
     except FileNotFoundError:
-        logging.error(f"File [{ROOT_PATH}/server.properties] not found")
+        logging.error(f"File [{target.root}/server.properties] not found")
         return {}
     else:
         return properties
@@ -0,0 +1,88 @@
+import logging
+import re
+import threading
+from time import time
+from typing import Dict, List, Mapping, Optional, Pattern, Sequence
+
+from prometheus_client.metrics_core import GaugeMetricFamily
+
+from src.core.stats_store import Sample
+
+RULES = ("inactive", "deny", "allow", "top_items")
+
+
+def parse_rules(text: str) -> Dict[str, Pattern]:
+    # "<family>=<regex>;<family>=<regex>", the regex is matched against the
+    # labels after "player" joined by ":" (mod:item, with, by...)
+    rules = {}
+    for rule in filter(None, (rule.strip() for rule in text.split(";"))):
+        family, sep, regex = rule.partition("=")
+        try:
+            if not sep:
+                raise ValueError("expected <family>=<regex>")
+            rules[family.strip()] = re.compile(regex)
+        except (ValueError, re.error) as e:
+            logging.error(f"Ignored rule [{rule}]: {e}")
+    return rules
+
+
+class Governor:
+    # Limits the series of player stats before their families are built. The
+    # allow/deny decision is taken once per interned stat key.
+
+    def __init__(
+        self,
+        families: Mapping[str, str],
+        active_days: float = 0,
+        allow: Optional[Dict[str, Pattern]] = None,
+        deny: Optional[Dict[str, Pattern]] = None,
+        top_items: int = 0,
+    ):
+        self.families = families
+        self.active_days = active_days
+        self.allow = allow or {}
+        self.deny = deny or {}
+        self.top_items = top_items
+        self._rules: List[Optional[str]] = []
+        self._lock = threading.Lock()
+        for name in self.allow.keys() | self.deny.keys():
+            if name not in families.values():
+                logging.error(f"Unknown family [{name}] in allow/deny rules")
+
+    def active_since_ns(self) -> int:
+        if not self.active_days:
+            return 0
+        return int((time() - self.active_days * 86400) * 1e9)
+
+    def rules(self, samples: Sequence[Optional[Sample]]) -> List[Optional[str]]:
+        # rule dropping each stat key, indexed by key id like the samples. The
+        # players threads of every target extend it, under the lock so it stays
+        # aligned with the key ids.
+        if len(self._rules) < len(samples):
+            with self._lock:
+                for key_id in range(len(self._rules), len(samples)):
+                    self._rules.append(self._rule(samples[key_id]))
+        return self._rules
+
+    def _rule(self, sample: Optional[Sample]) -> Optional[str]:
+        if sample is None:
+            return None
+        metric, labels, _ = sample
+        family = self.families[metric]
+        value = ":".join(labels)
+        if family in self.deny and self.deny[family].fullmatch(value):
+            return "deny"
+        if family in self.allow and not self.allow[family].fullmatch(value):
+            return "allow"
+        return None
+
+
+def series_dropped(dropped: Mapping[str, int]) -> GaugeMetricFamily:
+    metric = GaugeMetricFamily(
+        "mc_exporter_series_dropped",
+        "Player stats series not exported in the last refresh, by rule",
+        labels=("rule",),
+    )
+    for rule in RULES:
+        metric.add_metric((rule,), dropped.get(rule, 0))
+    return metric
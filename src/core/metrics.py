@@ -1,70 +1,95 @@
+from functools import partial
+from typing import Dict, List, Tuple
+
 from prometheus_client.metrics_core import GaugeMetricFamily, CounterMetricFamily
 
-from src.core.datasource import load_players, load_level_data, load_player_data
-from src.core.scrapers import get_players_online, get_entities, get_mods
+from src.core.datasource import (
+    load_players,
+    load_level_data,
+    change_watcher,
+)
+from src.core.players import PlayerRegistry, ShardFilter
+from src.core.warmup import parse_player_data_chunk
+from src.tools.file_index import DirectoryIndex
+from src.tools.nbt_reader import read_nbt_tags
 
 
-def players_online():
+def players_online(target):
     g = GaugeMetricFamily(
         name="mc_players_online",
         documentation="gives players online",
         labels=("player",),
     )
-    for player in load_players():
-        g.add_metric(labels=(player["name"],), value=1 if player["name"] in get_players_online() else 0)
+    registry = load_players(target)
+    online = registry.online
+    for player in registry.players:
+        g.add_metric(labels=player.labels, value=1 if player.id in online else 0)
     return g
 
 
-def players_uuid_name():
+def log_events(events: Dict[str, int]):
+    c = CounterMetricFamily(
+        "mc_log_events",
+        # latest.log is read from its start to rebuild the online players
+        "Give events read from the server log, counted from the start of the "
+        "log that was current when the exporter started",
+        labels=("event",),
+    )
+    for event, count in events.items():
+        c.add_metric((event,), count)
+    return c
+
+
+def players_uuid_name(target):
     g = GaugeMetricFamily(
         "mc_player_uuid", "Give player's name and uuid", labels=("uuid", "player")
     )
-    for player in load_players():
-        g.add_metric((player["uuid"], player["name"]), 1)
+    for player in load_players(target).local:
+        g.add_metric((player.uuid, player.name), 1)
     return g
 
 
-def entities_loaded():
+def entities_loaded(entities: List[Tuple[str, str, str]]):
     g = GaugeMetricFamily(
         "mc_player_entities_loaded",
         "Give entities loaded on forge server",
         labels=("mod", "entity"),
     )
-    for count, mod, entity in get_entities():
+    for count, mod, entity in entities:
         g.add_metric((mod, entity), int(count))
     return g
 
 
-def mods():
+def mods(mod_list: List[Tuple[str, str]]):
     g = GaugeMetricFamily(
         "mc_player_mods", "Give mods on forge server", labels=("mod", "version")
     )
-    for mod, version in get_mods():
+    for mod, version in mod_list:
         g.add_metric((mod, version), 1)
     return g
 
 
-def world_infos():
+def world_infos(target):
     g = GaugeMetricFamily(
         name="mc_world_infos",
         documentation="Give server info",
         labels=("version", "difficulty", "game_mode", "hardcore"),
     )
-    if infos := load_level_data():
+    if infos := load_level_data(target):
         g.add_metric(
             (
-                infos["Data"]["Version"]["Name"].value,
-                str(infos["Data"]["Difficulty"].value),
-                str(infos["Data"]["GameType"].value),
-                str(infos["Data"]["hardcore"].value),
+                infos["Data.Version.Name"],
+                str(infos["Data.Difficulty"]),
+                str(infos["Data.GameType"]),
+                str(infos["Data.hardcore"]),
             ),
             1,
         )
     return g
 
 
-def player_data(uuid: str, name: str):
-    metrics = {
+def _player_data_metrics():
+    return {
         "foodLevel": GaugeMetricFamily(
             name="mc_player_food_level",
             documentation="Give food level",
@@ -88,8 +113,33 @@ def player_data(uuid: str, name: str):
             name="mc_player_xp", documentation="Give xp total", labels=["player"]
         ),
     }
-    data = load_player_data(uuid)
-    if data:
-        for key, metric in metrics.items():
-            metric.add_metric(labels=[name], value=data[key].value)
+
+
+PLAYER_DATA_KEYS = tuple(_player_data_metrics())
+
+
+def parse_player_data(path: str) -> Tuple[float, ...]:
+    data = read_nbt_tags(path, PLAYER_DATA_KEYS)
+    return tuple(data[key] for key in PLAYER_DATA_KEYS)
+
+
+def make_player_data_index(world: str, accept: ShardFilter = None) -> DirectoryIndex:
+    return DirectoryIndex(
+        f"{world}/playerdata",
+        ".dat",
+        parse_player_data,
+        change_watcher,
+        parse_chunk=partial(parse_player_data_chunk, tags=PLAYER_DATA_KEYS),
+        accept=accept,
+    )
+
+
+def player_data(target, players: PlayerRegistry):
+    target.player_data_index.refresh()
+    metrics = _player_data_metrics()
+    for player in players.local:
+        data = target.player_data_index.get(player.uuid)
+        if data:
+            for metric, value in zip(metrics.values(), data):
+                metric.add_metric(labels=player.labels, value=value)
     return metrics
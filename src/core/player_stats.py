@@ -1,11 +1,32 @@
 import logging
 import re
-from typing import Dict
+from collections import Counter, defaultdict
+from typing import Dict, Optional
 
 from cachetools import cached
 from prometheus_client.metrics_core import CounterMetricFamily
 
-from src.core.datasource import load_player_stats
+from src import (
+    STATS_ACTIVE_DAYS,
+    STATS_ALLOW,
+    STATS_DENY,
+    STATS_TOP_ITEMS,
+)
+from src.core.datasource import change_watcher
+from src.core.governor import Governor, parse_rules, series_dropped
+from src.core.players import PlayerRegistry, ShardFilter
+from src.core.stats_store import (
+    PlayerStats,
+    Sample,
+    StatKey,
+    StatKeys,
+    StatTotals,
+    read_player_stats,
+)
+from src.core.warmup import StatsRecord, parse_stats_chunk
+from src.tools.file_index import DirectoryIndex
+from src.tools.instrumentation import STAGE_DURATION
+from src.tools.json_reader import read_json
 
 pattern = re.compile(r"(?<!^)(?=[A-Z])")
 
@@ -31,18 +52,53 @@ INTERACTIONS = {
 
 IGNORED = {"drop"}
 
-INTERACTIONS_OLD = {
-    "open_barrel": "barrel",
-    "trapped_chest_triggered": "trapped_chest",
-    "talked_to_villager": "villager",
-    "open_shulker_box": "shulker_box",
-    "bell_ring": "bell",
-    "cake_slices_eaten": "cake_slice",
-    "chest_opened": "chest",
-    "dispenser_inspected": "dispenser",
-    "dropper_inspected": "dropper",
-    "enderchest_opened": "enderchest",
-    "hopper_inspected": "hopper",
+# custom stats counted in ticks, exported in seconds
+TIMES = {
+    "play_one_minute": "played",
+    "play_time": "played",
+    "total_world_time": "played_with_paused",
+    "sneak_time": "sneak",
+}
+
+# custom stats whose name is a prefix or suffix followed by a label, the first
+# matching group gives the metric
+CUSTOM_PATTERN = re.compile(
+    r"^(?:(?P<distance>.+)_one_cm"
+    r"|clean_(?P<clean>.+)"
+    r"|time_(?P<time>since_.+)"
+    r"|interact_with_(?P<interact>.+))$"
+)
+
+# stats before 1.13: "stat.<category>.<mod>.<item>" or "stat.<custom>"
+CATEGORIES_OLD = {
+    "mine_block": "mined",
+    "break_item": "broken",
+    "craft_item": "crafted",
+    "use_item": "used",
+    "pickup": "picked_up",
+    "drop": "dropped",
+    "kill_entity": "killed",
+    "entity_killed_by": "killed_by",
+}
+
+CUSTOM_OLD = {
+    "trapped_chest_triggered": "trigger_trapped_chest",
+    "shulker_box_opened": "open_shulker_box",
+    "cake_slices_eaten": "eat_cake_slice",
+    "chest_opened": "open_chest",
+    "dispenser_inspected": "inspect_dispenser",
+    "dropper_inspected": "inspect_dropper",
+    "enderchest_opened": "open_enderchest",
+    "hopper_inspected": "inspect_hopper",
+    "item_enchanted": "enchant_item",
+    "record_played": "play_record",
+    "flower_potted": "pot_flower",
+    "noteblock_played": "play_noteblock",
+    "noteblock_tuned": "tune_noteblock",
+    "cauldron_filled": "fill_cauldron",
+    "cauldron_used": "use_cauldron",
+    "armor_cleaned": "clean_armor",
+    "banner_cleaned": "clean_banner",
 }
 
 
@@ -241,119 +297,164 @@ def _player_stats_metrics() -> Dict[str, CounterMetricFamily]:
     }
 
 
-def player_stats_metrics(uuid: str, name: str) -> Dict:
-    player_stats = load_player_stats(uuid)
-    return (
-        fill_after_1_13(name, player_stats)
-        if player_stats.get("stats")
-        else fill_before_1_13(name, player_stats)
+PLAYER_STATS_METRICS = frozenset(_player_stats_metrics())
+
+
+CATEGORIES = frozenset(CATEGORIES_OLD.values())
+
+
+def _compile_custom_stats() -> Dict[str, Optional[Sample]]:
+    custom_stats = {}
+    # the other metrics have labels besides "player"
+    for metric in PLAYER_STATS_METRICS - CATEGORIES - CUSTOM_PATTERN.groupindex.keys():
+        custom_stats[metric] = (metric, (), False)
+    for item, target in INTERACTIONS.items():
+        custom_stats[item] = ("interact", (target,), False)
+    for item, label in TIMES.items():
+        custom_stats[item] = ("time", (label,), True)
+    for item in IGNORED:
+        custom_stats[item] = None
+    return custom_stats
+
+
+CUSTOM_STATS = _compile_custom_stats()
+
+
+@STAGE_DURATION.labels("classify", "stats").time()
+def classify(key: StatKey) -> Optional[Sample]:
+    # called once per distinct key by StatKeys, which memoizes the result
+    category, mod, item = key
+    if category.startswith("stat."):
+        category, mod, item = normalize_before_1_13(category[len("stat.") :], mod, item)
+
+    if category != "custom":
+        if category in CATEGORIES:
+            return category, (mod, item), False
+        logging.error(f"category [{category}] not supported")
+        return None
+
+    if item in CUSTOM_STATS:
+        return CUSTOM_STATS[item]
+    if match := CUSTOM_PATTERN.match(item):
+        return match.lastgroup, (match[match.lastgroup],), match.lastgroup == "time"
+    logging.error(f"metric [{item}] not supported")
+    return None
+
+
+# shared by every target, keys are classified once for all servers
+stat_keys = StatKeys(classify)
+
+
+def parse_player_stats(path: str) -> PlayerStats:
+    return PlayerStats.build(stat_keys, read_player_stats(read_json(path) or {}))
+
+
+def finish_player_stats(record: StatsRecord) -> PlayerStats:
+    keys, values = record
+    return PlayerStats.build(stat_keys, zip(keys, values))
+
+
+def make_stats_index(
+    world: str, totals: StatTotals, accept: ShardFilter = None
+) -> DirectoryIndex:
+    return DirectoryIndex(
+        f"{world}/stats",
+        ".json",
+        parse_player_stats,
+        change_watcher,
+        parse_chunk=parse_stats_chunk,
+        finish=finish_player_stats,
+        on_update=totals.update,
+        accept=accept,
     )
 
 
-def fill_after_1_13(name: str, player_stats: Dict[str, Dict[str, Dict[str, int]]]):
-    metrics = _player_stats_metrics()
-    player_stats = player_stats["stats"]
-
-    for category, sub in player_stats.items():
-        category = category.split(":")[1]
-
-        for key, value in sub.items():
-            mod, item = key.split(":")
-            if category == "custom":
-                if item.endswith("_one_cm"):
-                    metrics["distance"].add_metric(
-                        (name, item[: -len("_one_cm")]), value
-                    )
-                elif item.startswith("clean_"):
-                    metrics["clean"].add_metric((name, item[len("clean_") :]), value)
-                elif item.startswith("time_since_"):
-                    metrics["time"].add_metric(
-                        (name, item[len("time_") :]), value / 20 if value else 0
-                    )
-                elif item == "play_one_minute" or item == "play_time":
-                    metrics["time"].add_metric(
-                        (name, "played"), value / 20 if value else 0
-                    )
-                elif item == "total_world_time":
-                    metrics["time"].add_metric(
-                        (name, "played_with_paused"), value / 20 if value else 0
-                    )
-                elif item == "sneak_time":
-                    metrics["time"].add_metric(
-                        (name, "sneak"), value / 20 if value else 0
-                    )
-                elif item in INTERACTIONS.keys():
-                    metrics["interact"].add_metric((name, INTERACTIONS[item]), value)
-                elif item.startswith("interact_with_"):
-                    metrics["interact"].add_metric(
-                        (name, item[len("interact_with_") :]), value
-                    )
-                elif item in IGNORED:
-                    continue
-                elif item in metrics:
-                    metrics[item].add_metric((name,), value)
-                else:
-                    logging.error(f"metric [{item}] not supported")
-            else:
-                metrics[category].add_metric((name, mod, item), value)
+governor = Governor(
+    {metric: family.name for metric, family in _player_stats_metrics().items()},
+    active_days=STATS_ACTIVE_DAYS,
+    allow=parse_rules(STATS_ALLOW),
+    deny=parse_rules(STATS_DENY),
+    top_items=STATS_TOP_ITEMS,
+)
 
-    return metrics
+# labels of the sample summing the items after the top ones
+OTHER_ITEMS = ("other", "other")
 
 
-def fill_before_1_13(name: str, player_stats):
+def player_stats_metrics(target, players: PlayerRegistry) -> Dict:
+    stats_index = target.stats_index
+    stats_index.refresh()
     metrics = _player_stats_metrics()
-    for keys, value in player_stats.items():
-        keys = keys.split(".")[1:]  # ignore "stat"
-        if len(keys) == 3:
-            key, mod, item = keys
-        elif len(keys) == 2:
-            key, mod, item = keys[0], "minecraft", keys[1]
-        elif len(keys) > 3:
-            key, mod, item = keys[0], keys[1], ".".join(keys[2:])
-        else:
-            key, mod, item = keys[0], "", ""
-        key = camel_to_snake(key)
-
-        if key.endswith("_one_cm"):
-            metrics["distance"].add_metric((name, key[: -len("OneCm")]), value)
-        elif key.startswith("time_since_"):
-            metrics["time"].add_metric(
-                (name, key[len("time_since_") :]), value / 20 if value else 0
-            )
-        elif "play_one_minute" == key:
-            metrics["time"].add_metric((name, "played"), value / 20 if value else 0)
-        elif "sneak_time" == key:
-            metrics["time"].add_metric((name, "sneak"), value / 20 if value else 0)
-        elif key in INTERACTIONS_OLD.keys():
-            metrics["interact"].add_metric((name, INTERACTIONS_OLD[key]), value)
-        elif key.endswith("_interaction"):
-            metrics["interact"].add_metric((name, item[: -len("_interaction")]), value)
-        elif "mine_block" == key:
-            metrics["mined"].add_metric((name, mod, item), value)
-        elif "craft_item" == key:
-            metrics["crafted"].add_metric((name, mod, item), value)
-        elif "use_item" == key:
-            metrics["used"].add_metric((name, mod, item), value)
-        elif "pickup" == key:
-            metrics["picked_up"].add_metric((name, mod, item), value)
-        elif "drop" == key and mod and item:  # ignore drop total
-            metrics["dropped"].add_metric((name, mod, item), value)
-        elif "kill_entity" == key:
-            metrics["killed"].add_metric((name, mod, item), value)
-        elif "entity_killed_by" == key:
-            metrics["killed_by"].add_metric((name, mod, item), value)
-        elif "item_enchanted" == key:
-            metrics["enchant_item"].add_metric((name,), value)
-        elif "record_played" == key:
-            metrics["play_record"].add_metric((name,), value)
-        elif "flower_potted" == key:
-            metrics["pot_flower"].add_metric((name,), value)
-
-        elif key in IGNORED:
+    samples = stat_keys.samples
+    rules = governor.rules(samples)
+    active_since = governor.active_since_ns()
+    top_items = governor.top_items
+    dropped = Counter()
+    for player in players.local:
+        uuid = player.uuid
+        if (player_stats := stats_index.get(uuid)) is None:
             continue
-        else:
-            try:
-                metrics[key].add_metric((name,), value)
-            except KeyError:
-                logging.error(f"Unsupported keys {keys} for stats player")
+        if active_since and stats_index.signature(uuid).mtime_ns < active_since:
+            dropped["inactive"] += len(player_stats.keys)
+            continue
+        name = player.labels
+        items = defaultdict(list)
+        for key_id, value in zip(player_stats.keys, player_stats.values):
+            if rule := rules[key_id]:
+                dropped[rule] += 1
+                continue
+            metric, labels, ticks = samples[key_id]
+            if top_items and metric in CATEGORIES:
+                items[metric].append((value, labels))
+                continue
+            metrics[metric].add_metric(
+                name + labels, (value / 20 if value else 0) if ticks else value
+            )
+        for metric, values in items.items():
+            # folding a single item would not save a series
+            if len(values) > top_items + 1:
+                values.sort(reverse=True)
+                others = values[top_items:]
+                del values[top_items:]
+                values.append((sum(value for value, _ in others), OTHER_ITEMS))
+                dropped["top_items"] += len(others) - 1
+            for value, labels in values:
+                metrics[metric].add_metric(name + labels, value)
+    metrics["series_dropped"] = series_dropped(dropped)
     return metrics
+
+
+def _server_stats_metrics() -> Dict[str, CounterMetricFamily]:
+    return {
+        metric: CounterMetricFamily(
+            name=family.name.replace("mc_player_", "mc_server_", 1),
+            documentation=f"{family.documentation}, summed over all players",
+            labels=family._labelnames[1:],
+        )
+        for metric, family in _player_stats_metrics().items()
+    }
+
+
+def server_stats_metrics(target) -> Dict:
+    # pre-1.13 and current keys of the same stat share a sample, sum them
+    totals = defaultdict(int)
+    samples = stat_keys.samples
+    for key_id, (value, players) in enumerate(
+        zip(target.stat_totals.values, target.stat_totals.players)
+    ):
+        if players:
+            totals[samples[key_id]] += value
+
+    metrics = _server_stats_metrics()
+    for (metric, labels, ticks), value in totals.items():
+        metrics[metric].add_metric(labels, value / 20 if ticks else value)
+    return metrics
+
+
+def normalize_before_1_13(stat: str, mod: str, item: str) -> StatKey:
+    key = camel_to_snake(stat)
+    if key in CATEGORIES_OLD and mod and item:
+        return CATEGORIES_OLD[key], mod, item
+    if key.endswith("_interaction"):
+        return "custom", "minecraft", f"interact_with_{key[: -len('_interaction')]}"
+    return "custom", "minecraft", CUSTOM_OLD.get(key, key)
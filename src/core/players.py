@@ -0,0 +1,97 @@
+import threading
+import zlib
+from typing import (
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+ShardFilter = Optional[Callable[[str], bool]]
+
+
+class Player(NamedTuple):
+    # stable for a uuid during the life of the exporter
+    id: int
+    uuid: str
+    name: str
+    # label values of the player families, built once
+    labels: Tuple[str]
+
+
+def shard_of(uuid: str, count: int) -> int:
+    # crc32 is the same in every process, unlike hash() of a str
+    return zlib.crc32(uuid.lower().encode()) % count
+
+
+def make_shard_filter(index: int, count: int) -> ShardFilter:
+    # None when not sharded, every player is exported
+    if count <= 1:
+        return None
+    if not 0 <= index < count:
+        raise ValueError(f"Shard index [{index}] out of [0, {count})")
+    return lambda uuid: shard_of(uuid, count) == index
+
+
+class PlayerRegistry:
+    # Players of usercache.json indexed by uuid and name, rebuilt only when the
+    # file cache returns a new document. The online set holds player ids.
+    # `local` are the players of this shard, the families of each player only
+    # export them.
+
+    def __init__(self, accept: ShardFilter = None):
+        self.accept = accept
+        self.players: Tuple[Player, ...] = ()
+        self.local: Tuple[Player, ...] = ()
+        self.by_uuid: Dict[str, Player] = {}
+        self.by_name: Dict[str, Player] = {}
+        self.online: FrozenSet[int] = frozenset()
+        self._online_names: FrozenSet[str] = frozenset()
+        self._ids: Dict[str, int] = {}
+        self._users: Optional[List[Dict[str, str]]] = None
+        self._lock = threading.Lock()
+
+    def update(self, users: List[Dict[str, str]]) -> "PlayerRegistry":
+        if users is self._users:
+            return self
+        with self._lock:
+            if users is not self._users:
+                players = tuple(
+                    Player(
+                        self._ids.setdefault(user["uuid"], len(self._ids)),
+                        user["uuid"],
+                        user["name"],
+                        (user["name"],),
+                    )
+                    for user in users
+                )
+                self.by_uuid = {player.uuid: player for player in players}
+                self.by_name = {player.name: player for player in players}
+                self.players = players
+                self.local = (
+                    tuple(player for player in players if self.accept(player.uuid))
+                    if self.accept
+                    else players
+                )
+                self._users = users
+                self._resolve_online()
+        return self
+
+    def set_online(self, names: Iterable[str]):
+        with self._lock:
+            self._online_names = frozenset(names)
+            self._resolve_online()
+
+    def is_online(self, player: Player) -> bool:
+        return player.id in self.online
+
+    def _resolve_online(self):
+        # names of players not in usercache.json yet are kept for the next build
+        by_name = self.by_name
+        self.online = frozenset(
+            by_name[name].id for name in self._online_names if name in by_name
+        )
@@ -0,0 +1,189 @@
+import logging
+import os
+from bisect import bisect_left
+from collections import deque
+from functools import partial
+from time import time
+from typing import Deque, Dict, Iterator, List, NamedTuple, Tuple
+
+from prometheus_client.metrics_core import GaugeMetricFamily
+
+from src.tools.file_index import DirectoryIndex, FileSignature
+from src.tools.instrumentation import FILES_PARSED, PARSE_ERRORS, STAGE_DURATION
+from src.tools.nbt_reader import scan_nbt_list_lengths
+from src.tools.region import decompress_chunk, read_region_chunks, read_region_header
+
+# folders of the vanilla dimensions, datapack ones are in dimensions/<mod>/<name>
+VANILLA_DIMENSIONS = {"overworld": "", "the_nether": "/DIM-1", "the_end": "/DIM1"}
+
+# entities are saved in the chunks until 1.17 then in entities/*.mca, block
+# entities are renamed in 1.18
+ENTITY_TAGS = ("Level.Entities", "Entities")
+BLOCK_ENTITY_TAGS = ("Level.TileEntities", "block_entities")
+
+
+class EntityCounts(NamedTuple):
+    dimension: str
+    signature: FileSignature
+    entities: int
+    block_entities: int
+
+
+def find_dimensions(world: str) -> Dict[str, str]:
+    dimensions = {
+        name: f"{world}{folder}" for name, folder in VANILLA_DIMENSIONS.items()
+    }
+    try:
+        with os.scandir(f"{world}/dimensions") as namespaces:
+            for namespace in namespaces:
+                if not namespace.is_dir():
+                    continue
+                with os.scandir(namespace.path) as folders:
+                    for folder in folders:
+                        if folder.is_dir():
+                            dimensions[f"{namespace.name}:{folder.name}"] = folder.path
+    except FileNotFoundError:
+        pass
+    return dimensions
+
+
+class RegionScanner:
+    # Chunk counts of each dimension read from the headers of the region files
+    # (8 KiB each, only for the files that changed), and entity counts sampled
+    # from the chunks, one region file per call of sample_next().
+
+    def __init__(self, world: str, recent_seconds: float):
+        self.world = world
+        self.recent_seconds = recent_seconds
+        self.indexes: Dict[str, DirectoryIndex] = {}
+        # by path of region and entities files
+        self.entity_counts: Dict[str, EntityCounts] = {}
+        self._pending: Deque[Tuple[str, str, FileSignature]] = deque()
+
+    def refresh(self):
+        for dimension, path in find_dimensions(self.world).items():
+            if dimension not in self.indexes and os.path.isdir(f"{path}/region"):
+                self.indexes[dimension] = DirectoryIndex(
+                    f"{path}/region",
+                    ".mca",
+                    partial(read_region_header, recent_seconds=self.recent_seconds),
+                    # polled: the server writes the .mca files in place and
+                    # keeps them open, inotify reports no change until closed
+                    watcher=None,
+                )
+        for index in self.indexes.values():
+            index.refresh()
+
+    def sample_next(self):
+        # the files are listed again once every changed one was sampled
+        if not self._pending:
+            self._pending.extend(self._changed_files())
+        if not self._pending:
+            return
+        dimension, path, signature = self._pending.popleft()
+        try:
+            with STAGE_DURATION.labels("parse", "entities").time():
+                counts = self._count_entities(path)
+        except (OSError, ValueError) as e:
+            logging.error(f"Failed to sample entities of [{path}]: {e}")
+            PARSE_ERRORS.labels("entities").inc()
+            return
+        FILES_PARSED.labels("entities").inc()
+        self.entity_counts[path] = EntityCounts(dimension, signature, *counts)
+
+    def _changed_files(self) -> Iterator[Tuple[str, str, FileSignature]]:
+        seen = set()
+        for dimension, path in find_dimensions(self.world).items():
+            for folder in ("region", "entities"):
+                try:
+                    with os.scandir(f"{path}/{folder}") as entries:
+                        files = [
+                            (entry.path, FileSignature.of(entry.stat()))
+                            for entry in entries
+                            if entry.name.endswith(".mca")
+                        ]
+                except FileNotFoundError:
+                    continue
+                for file, signature in files:
+                    seen.add(file)
+                    counts = self.entity_counts.get(file)
+                    if counts is None or counts.signature != signature:
+                        yield dimension, file, signature
+        for file in self.entity_counts.keys() - seen:
+            del self.entity_counts[file]
+
+    @staticmethod
+    def _count_entities(path: str) -> Tuple[int, int]:
+        entities = block_entities = 0
+        for compression, data in read_region_chunks(path):
+            try:
+                lengths = scan_nbt_list_lengths(
+                    decompress_chunk(compression, data),
+                    ENTITY_TAGS + BLOCK_ENTITY_TAGS,
+                )
+            except Exception as e:
+                # a chunk being written or stored in an external file
+                logging.debug(f"Skipped a chunk of [{path}]: {e}")
+                continue
+            entities += sum(lengths.get(tag, 0) for tag in ENTITY_TAGS)
+            block_entities += sum(lengths.get(tag, 0) for tag in BLOCK_ENTITY_TAGS)
+        return entities, block_entities
+
+
+def region_metrics(scanner: RegionScanner) -> List[GaugeMetricFamily]:
+    files = GaugeMetricFamily(
+        "mc_world_region_files",
+        "Give region files of each dimension",
+        labels=("dimension",),
+    )
+    size = GaugeMetricFamily(
+        "mc_world_region_bytes",
+        "Give size of the region files of each dimension",
+        labels=("dimension",),
+    )
+    chunks = GaugeMetricFamily(
+        "mc_world_chunks",
+        "Give generated chunks of each dimension",
+        labels=("dimension",),
+    )
+    recent = GaugeMetricFamily(
+        "mc_world_chunks_recent",
+        "Give chunks saved in the last REGION_RECENT_SECONDS of each dimension",
+        labels=("dimension",),
+    )
+    since = time() - scanner.recent_seconds
+    for dimension, index in scanner.indexes.items():
+        headers = [header for _, header in index.items()]
+        files.add_metric((dimension,), len(headers))
+        size.add_metric((dimension,), sum(header.size for header in headers))
+        chunks.add_metric((dimension,), sum(header.chunks for header in headers))
+        recent.add_metric(
+            (dimension,),
+            sum(
+                len(header.recent) - bisect_left(header.recent, since)
+                for header in headers
+            ),
+        )
+    return [files, size, chunks, recent]
+
+
+def entity_metrics(scanner: RegionScanner) -> List[GaugeMetricFamily]:
+    entities = GaugeMetricFamily(
+        "mc_world_entities",
+        "Give entities saved in the chunks of each dimension",
+        labels=("dimension",),
+    )
+    block_entities = GaugeMetricFamily(
+        "mc_world_block_entities",
+        "Give block entities saved in the chunks of each dimension",
+        labels=("dimension",),
+    )
+    totals: Dict[str, List[int]] = {}
+    for counts in scanner.entity_counts.values():
+        total = totals.setdefault(counts.dimension, [0, 0])
+        total[0] += counts.entities
+        total[1] += counts.block_entities
+    for dimension, (entity_count, block_entity_count) in sorted(totals.items()):
+        entities.add_metric((dimension,), entity_count)
+        block_entities.add_metric((dimension,), block_entity_count)
+    return [entities, block_entities]
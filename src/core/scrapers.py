@@ -1,31 +1,72 @@
 import re
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
-from cachetools import cached, TTLCache
+from cachetools import cachedmethod
+from cachetools.keys import hashkey
 
-from src.core.datasource import rcon_command
+from src.core.datasource import rcon_command, async_rcon_command
 
 entity_list_pattern = re.compile(r"(\d+): (\w+):(\w+)")
 mod_list_pattern = re.compile(r".*: (\w+) \((.+)\)")
 
+# key of the single result held by the RCON caches of a target
+RESULT_KEY = hashkey()
 
-@cached(cache=TTLCache(maxsize=1, ttl=60))
-def get_players_online() -> List[str]:
-    return (
-        [y.strip() for y in x.split(":")[1].split(",")]
-        if (x := rcon_command("list"))
-        else []
-    )
 
+def parse_players_online(response: Optional[str]) -> List[str]:
+    return [y.strip() for y in response.split(":")[1].split(",")] if response else []
 
-def get_entities() -> List[Tuple[str, str, str]]:
-    return (
-        entity_list_pattern.findall(x)
-        if (x := rcon_command("forge entity list"))
-        else []
-    )
 
+def parse_entities(response: Optional[str]) -> List[Tuple[str, str, str]]:
+    return entity_list_pattern.findall(response) if response else []
 
-@cached(cache=TTLCache(maxsize=1, ttl=600))
-def get_mods() -> List[Tuple[str, str]]:
-    return mod_list_pattern.findall(x) if (x := rcon_command("forge mods")) else []
+
+def parse_mods(response: Optional[str]) -> List[Tuple[str, str]]:
+    return mod_list_pattern.findall(response) if response else []
+
+
+@cachedmethod(lambda target: target.players_online_cache)
+def get_players_online(target) -> List[str]:
+    return parse_players_online(rcon_command(target, "list"))
+
+
+def reconcile_players_online(target):
+    # a failed command leaves the players read from the log untouched
+    if (response := rcon_command(target, "list")) is not None:
+        target.server_log.reconcile(parse_players_online(response))
+
+
+def get_entities(target) -> List[Tuple[str, str, str]]:
+    return parse_entities(rcon_command(target, "forge entity list"))
+
+
+@cachedmethod(lambda target: target.mods_cache)
+def get_mods(target) -> List[Tuple[str, str]]:
+    return parse_mods(rcon_command(target, "forge mods"))
+
+
+async def async_get_players_online(target) -> List[str]:
+    cache = target.players_online_cache
+    if (online := cache.get(RESULT_KEY)) is None:
+        online = cache[RESULT_KEY] = parse_players_online(
+            await async_rcon_command(target, "list")
+        )
+    return online
+
+
+async def async_reconcile_players_online(target):
+    if (response := await async_rcon_command(target, "list")) is not None:
+        target.server_log.reconcile(parse_players_online(response))
+
+
+async def async_get_entities(target) -> List[Tuple[str, str, str]]:
+    return parse_entities(await async_rcon_command(target, "forge entity list"))
+
+
+async def async_get_mods(target) -> List[Tuple[str, str]]:
+    cache = target.mods_cache
+    if (mod_list := cache.get(RESULT_KEY)) is None:
+        mod_list = cache[RESULT_KEY] = parse_mods(
+            await async_rcon_command(target, "forge mods")
+        )
+    return mod_list
@@ -0,0 +1,88 @@
+import logging
+import re
+import threading
+from time import monotonic
+from typing import Dict, Iterable, Set
+
+from src.tools.log_tail import LogTail
+
+# "[12:34:56] [Server thread/INFO]: ", with forge "[.../INFO] [minecraft/...]: "
+# and paper "[12:34:56 INFO]: "
+message_pattern = re.compile(
+    r"\[(?:[^\]]+\] \[Server thread/|[\d:]+ )INFO\](?: \[[^\]]*\])?: (.*)"
+)
+join_pattern = re.compile(r"(\w{1,16}) joined the game$")
+leave_pattern = re.compile(r"(\w{1,16}) left the game$")
+advancement_pattern = re.compile(
+    r"(\w{1,16}) has (?:made the advancement|completed the challenge|reached the goal) \["
+)
+# vanilla death messages start with the player name and one of these
+death_pattern = re.compile(
+    r"(\w{1,16}) (?:was |drowned|died|blew up|burned to death|went up in flames|"
+    r"went off with a bang|hit the ground too hard|fell |tried to swim in lava|"
+    r"starved to death|suffocated in a wall|experienced kinetic energy|"
+    r"withered away|froze to death|walked into|discovered the floor was lava|"
+    r"didn't want to live|left the confines of this world)"
+)
+stop_pattern = re.compile(r"Stopping (?:the )?server")
+
+EVENTS = ("join", "leave", "death", "advancement")
+
+
+class ServerLog:
+    # Online players and event counts read from logs/latest.log as it is
+    # written. RCON, when enabled, reconciles the online set from time to time.
+
+    def __init__(self, path: str, reconcile_interval: float):
+        self.path = path
+        self.reconcile_interval = reconcile_interval
+        self.online: Set[str] = set()
+        self.events: Dict[str, int] = dict.fromkeys(EVENTS, 0)
+        self._tail = LogTail(path, on_rotate=self._restarted)
+        self._lock = threading.Lock()
+        self._reconciled_at = None
+
+    def refresh(self):
+        with self._lock:
+            for line in self._tail.lines():
+                self._handle(line)
+
+    def _handle(self, line: str):
+        match = message_pattern.match(line)
+        if match is None:
+            return
+        message = match.group(1)
+        if match := join_pattern.match(message):
+            self.online.add(match.group(1))
+            self.events["join"] += 1
+        elif match := leave_pattern.match(message):
+            self.online.discard(match.group(1))
+            self.events["leave"] += 1
+        elif match := advancement_pattern.match(message):
+            self.events["advancement"] += 1
+        elif (match := death_pattern.match(message)) and match.group(1) in self.online:
+            self.events["death"] += 1
+        elif stop_pattern.match(message):
+            self.online.clear()
+
+    def _restarted(self):
+        # a new latest.log is a new run of the server, a crash logs no leave
+        self.online.clear()
+
+    def reconcile_due(self) -> bool:
+        return (
+            self._reconciled_at is None
+            or monotonic() - self._reconciled_at >= self.reconcile_interval
+        )
+
+    def reconcile(self, online: Iterable[str]):
+        with self._lock:
+            online = {name for name in online if name}
+            if online != self.online:
+                logging.warning(
+                    f"Players online from [{self.path}] differ from RCON: "
+                    f"missing [{', '.join(sorted(online - self.online))}] "
+                    f"extra [{', '.join(sorted(self.online - online))}]"
+                )
+                self.online = online
+            self._reconciled_at = monotonic()
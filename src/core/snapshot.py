@@ -0,0 +1,236 @@
+import asyncio
+import cProfile
+import inspect
+import logging
+import threading
+import tracemalloc
+from time import monotonic, time
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from prometheus_client.metrics_core import GaugeMetricFamily, Metric
+
+from src.tools.exposition import EncodedFamilies, encode_families
+from src.tools.instrumentation import STAGE_DURATION, profile_report
+
+# delay after a change notification, so a burst of saves (autosave writes every
+# player at once) is picked up by a single refresh
+WAKE_DELAY = 0.5
+
+
+class SourceSnapshot(NamedTuple):
+    encoded: EncodedFamilies
+    updated_at: float
+    duration: float
+
+
+class Source(NamedTuple):
+    name: str
+    interval: float
+    collect: Callable[[], Union[Iterable[Metric], Awaitable[Iterable[Metric]]]]
+    # run once before the first refresh, the source has no snapshot meanwhile
+    warm_up: Optional[Callable[[], None]] = None
+    # server the source reads, names are unique per target
+    target: str = ""
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return self.target, self.name
+
+
+class SnapshotEngine:
+    def __init__(self, sources: List[Source]):
+        self.sources = sources
+        self._snapshots: Dict[Tuple[str, str], SourceSnapshot] = {}
+        # bumped each time the encoded data of a source changes
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wakeups = {source.key: threading.Event() for source in sources}
+        self._threads: List[threading.Thread] = []
+        # set while profiling, each refresh adds its own profile once done
+        self._profiles: Optional[List[cProfile.Profile]] = None
+        self._profile_lock = threading.Lock()
+
+    def start(self):
+        for source in self.sources:
+            thread = threading.Thread(
+                target=self._run,
+                args=(source,),
+                name=f"refresh-{source.target}-{source.name}",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        for wakeup in self._wakeups.values():
+            wakeup.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads.clear()
+
+    def refresh(self, source: Source, loop: Optional[asyncio.AbstractEventLoop] = None):
+        start = monotonic()
+        profile = None
+        if (profiles := self._profiles) is not None:
+            # cProfile only sees the thread it is enabled in
+            profile = cProfile.Profile()
+            profile.enable()
+        try:
+            with STAGE_DURATION.labels("collect", source.name).time():
+                families = source.collect()
+                if inspect.isawaitable(families):
+                    families = loop.run_until_complete(families)
+                families = tuple(families)
+            previous = self._snapshots.get(source.key)
+            with STAGE_DURATION.labels("encode", source.name).time():
+                encoded = encode_families(families, previous and previous.encoded)
+        except Exception:
+            logging.exception(
+                f"Refresh of source [{source.name}] of [{source.target}] failed"
+            )
+            return
+        finally:
+            if profile:
+                profile.disable()
+                # only complete refreshes are reported
+                profiles.append(profile)
+        snapshot = SourceSnapshot(encoded, time(), monotonic() - start)
+        with self._lock:
+            if previous is None or encoded is not previous.encoded:
+                self._generation += 1
+            # copy on write: readers always see a complete mapping without locking
+            self._snapshots = {**self._snapshots, source.key: snapshot}
+
+    def restore(
+        self,
+        snapshots: Dict[Tuple[str, str], Tuple[EncodedFamilies, float]],
+        generation: int,
+    ):
+        # encoded snapshots saved by a previous run, served until the first
+        # refresh of each source; call before start()
+        keys = {source.key for source in self.sources}
+        with self._lock:
+            self._snapshots = {
+                key: SourceSnapshot(encoded, updated_at, 0.0)
+                for key, (encoded, updated_at) in snapshots.items()
+                if key in keys
+            }
+            self._generation = generation
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def profile(self, seconds: float) -> Optional[str]:
+        # profiles the refreshes of every source for some seconds, None if a
+        # profile is already running
+        if not self._profile_lock.acquire(blocking=False):
+            return None
+        started_tracing = not tracemalloc.is_tracing()
+        try:
+            if started_tracing:
+                tracemalloc.start()
+            self._profiles = profiles = []
+            for wakeup in self._wakeups.values():
+                wakeup.set()
+            self._stop.wait(seconds)
+            self._profiles = None
+            profiles = list(profiles)
+            snapshot = tracemalloc.take_snapshot()
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+            self._profile_lock.release()
+        return profile_report(profiles, snapshot)
+
+    def wake(self, target: str, name: str):
+        if wakeup := self._wakeups.get((target, name)):
+            wakeup.set()
+
+    def snapshots(self) -> Dict[Tuple[str, str], SourceSnapshot]:
+        return self._snapshots
+
+    def encoded(self, target: str) -> Optional[Tuple[int, List[EncodedFamilies]]]:
+        # None for an unknown target
+        if not any(source.target == target for source in self.sources):
+            return None
+        with self._lock:
+            generation, snapshots = self._generation, self._snapshots
+        return generation, [
+            snapshot.encoded
+            for (source_target, _), snapshot in snapshots.items()
+            if source_target == target
+        ]
+
+    def _run(self, source: Source):
+        # coroutine sources keep one event loop per thread, so connections opened
+        # during a refresh can be reused by the next one; the others need none
+        loop = (
+            asyncio.new_event_loop()
+            if inspect.iscoroutinefunction(source.collect)
+            else None
+        )
+        wakeup = self._wakeups[source.key]
+        if source.warm_up:
+            start = monotonic()
+            try:
+                source.warm_up()
+            except Exception:
+                logging.exception(
+                    f"Warm-up of source [{source.name}] of [{source.target}] failed"
+                )
+            logging.info(
+                f"Source [{source.name}] of [{source.target}] warmed up in "
+                f"{monotonic() - start:.1f}s"
+            )
+        while not self._stop.is_set():
+            start = monotonic()
+            wakeup.clear()
+            self.refresh(source, loop)
+            if wakeup.wait(max(0.0, source.interval - (monotonic() - start))):
+                self._stop.wait(WAKE_DELAY)
+        if loop:
+            loop.close()
+
+
+class SnapshotCollector:
+    # the exporter own metrics about the snapshots, the families are only kept
+    # encoded and served by the app
+    def __init__(self, engine: SnapshotEngine):
+        self.engine = engine
+
+    def collect(self):
+        now = time()
+        age = GaugeMetricFamily(
+            "mc_exporter_snapshot_age_seconds",
+            "Seconds since the snapshot of each source was built",
+            labels=("target", "source"),
+        )
+        duration = GaugeMetricFamily(
+            "mc_exporter_refresh_duration_seconds",
+            "Duration of the last refresh of each source",
+            labels=("target", "source"),
+        )
+        snapshots = self.engine.snapshots()
+        for key, snapshot in snapshots.items():
+            age.add_metric(key, now - snapshot.updated_at)
+            duration.add_metric(key, snapshot.duration)
+        yield age
+        yield duration
+        yield GaugeMetricFamily(
+            "mc_exporter_warming",
+            "1 until every source has built its first snapshot, data is partial",
+            value=int(len(snapshots) < len(self.engine.sources)),
+        )
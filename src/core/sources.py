@@ -0,0 +1,86 @@
+from src.core.advancements import advancements_metrics
+from src.core.datasource import load_players
+from src.core.metrics import (
+    players_online,
+    players_uuid_name,
+    log_events,
+    world_infos,
+    player_data,
+    entities_loaded,
+    mods,
+)
+from src.core.player_stats import player_stats_metrics, server_stats_metrics
+from src.core.regions import entity_metrics, region_metrics
+from src.core.scrapers import (
+    get_players_online,
+    get_entities,
+    get_mods,
+    async_get_players_online,
+    async_get_entities,
+    async_get_mods,
+    reconcile_players_online,
+    async_reconcile_players_online,
+)
+from src.core.target import Target
+
+# collect functions of the sources refreshed for each target
+
+
+def collect_rcon(target: Target):
+    if not target.server_log:
+        target.players.set_online(get_players_online(target))
+        yield players_online(target)
+    elif target.server_log.reconcile_due():
+        reconcile_players_online(target)
+    if target.forge:
+        yield entities_loaded(get_entities(target))
+        yield mods(get_mods(target))
+
+
+async def collect_rcon_async(target: Target):
+    # the commands of a target run one after another on its connection, each
+    # with its own timeout: a hung command only times out its own family
+    families = []
+    if not target.server_log:
+        target.players.set_online(await async_get_players_online(target))
+        families.append(players_online(target))
+    elif target.server_log.reconcile_due():
+        await async_reconcile_players_online(target)
+    if target.forge:
+        families.append(entities_loaded(await async_get_entities(target)))
+        families.append(mods(await async_get_mods(target)))
+    return families
+
+
+def collect_log(target: Target):
+    target.server_log.refresh()
+    target.players.set_online(target.server_log.online)
+    yield players_online(target)
+    yield log_events(target.server_log.events)
+
+
+def collect_level(target: Target):
+    yield world_infos(target)
+
+
+def collect_advancements(target: Target):
+    yield from advancements_metrics(target, load_players(target))
+
+
+def collect_regions(target: Target):
+    target.regions.refresh()
+    yield from region_metrics(target.regions)
+
+
+def collect_entities(target: Target):
+    target.regions.sample_next()
+    yield from entity_metrics(target.regions)
+
+
+def collect_players(target: Target):
+    yield players_uuid_name(target)
+
+    players = load_players(target)
+    yield from player_data(target, players).values()
+    yield from player_stats_metrics(target, players).values()
+    yield from server_stats_metrics(target).values()
@@ -0,0 +1,252 @@
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import threading
+from array import array
+from time import monotonic
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.core.player_stats import stat_keys
+from src.core.snapshot import SnapshotEngine
+from src.core.stats_store import PlayerStats, StatKey
+from src.core.target import Target
+from src.tools.exposition import EncodedFamilies
+from src.tools.file_index import DirectoryIndex, FileSignature
+
+# bumped when the layout of the saved data changes, older files are discarded
+VERSION = "1"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS stat_keys (
+    id INTEGER PRIMARY KEY, category TEXT, mod TEXT, item TEXT
+);
+CREATE TABLE IF NOT EXISTS files (
+    directory TEXT,
+    name TEXT,
+    mtime_ns INTEGER,
+    size INTEGER,
+    inode INTEGER,
+    data BLOB,
+    PRIMARY KEY (directory, name)
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    target TEXT, source TEXT, updated_at REAL, gzipped BLOB,
+    PRIMARY KEY (target, source)
+);
+"""
+
+
+class StateStore:
+    # Parsed players files and the last encoded snapshots, saved to SQLite.
+    # Stat keys get their own ids in the file, ids of a process are not stable.
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._key_ids: Dict[StatKey, int] = {}
+        self._keys: List[StatKey] = []
+        # what the file holds: signatures per directory, encoding per source
+        self._saved_files: Dict[str, Dict[str, FileSignature]] = {}
+        self._saved_snapshots: Dict[Tuple[str, str], EncodedFamilies] = {}
+        self._stop = threading.Event()
+        try:
+            with self._db:
+                self._db.executescript(SCHEMA)
+                row = self._db.execute("SELECT value FROM meta WHERE key = 'version'")
+                if (row := row.fetchone()) is None or row[0] != VERSION:
+                    for table in ("stat_keys", "files", "snapshots", "meta"):
+                        self._db.execute(f"DELETE FROM {table}")
+                    self._db.execute(
+                        "INSERT INTO meta VALUES ('version', ?)", (VERSION,)
+                    )
+        except sqlite3.Error:
+            # not a database
+            self._db.close()
+            raise
+
+    def close(self):
+        self._db.close()
+
+    def _codecs(
+        self, target: Target
+    ) -> List[Tuple[DirectoryIndex, Callable, Callable]]:
+        return [
+            (target.stats_index, self._encode_stats, self._decode_stats),
+            (target.player_data_index, self._encode_vitals, self._decode_vitals),
+        ]
+
+    def _key_id(self, key: StatKey) -> int:
+        if (key_id := self._key_ids.get(key)) is None:
+            key_id = self._key_ids[key] = len(self._keys)
+            self._keys.append(key)
+            self._db.execute(
+                "INSERT INTO stat_keys VALUES (?, ?, ?, ?)", (key_id, *key)
+            )
+        return key_id
+
+    def _encode_stats(self, player_stats: PlayerStats) -> bytes:
+        keys = stat_keys.keys
+        key_ids = array("q", (self._key_id(keys[k]) for k in player_stats.keys))
+        return key_ids.tobytes() + player_stats.values.tobytes()
+
+    def _decode_stats(self, data: bytes) -> PlayerStats:
+        columns = array("q")
+        columns.frombytes(data)
+        half = len(columns) // 2
+        keys = (self._keys[key_id] for key_id in columns[:half])
+        return PlayerStats.build(stat_keys, zip(keys, columns[half:]))
+
+    @staticmethod
+    def _encode_vitals(vitals: Tuple[float, ...]) -> bytes:
+        return json.dumps(vitals).encode()
+
+    @staticmethod
+    def _decode_vitals(data: bytes) -> Tuple[float, ...]:
+        return tuple(json.loads(data))
+
+    def _reload(self):
+        # what the file holds, read again when a save was rolled back
+        rows = self._db.execute("SELECT category, mod, item FROM stat_keys ORDER BY id")
+        # ids are assigned in order from 0
+        self._keys = [tuple(key) for key in rows]
+        self._key_ids = {key: i for i, key in enumerate(self._keys)}
+        self._saved_files = {}
+        for directory, name, *signature in self._db.execute(
+            "SELECT directory, name, mtime_ns, size, inode FROM files"
+        ):
+            self._saved_files.setdefault(directory, {})[name] = FileSignature(
+                *signature
+            )
+        self._saved_snapshots = {}
+
+    def restore(self, targets: List[Target], engine: SnapshotEngine):
+        # everything is decoded before anything is restored, a file that fails
+        # to load leaves the indexes and the engine cold
+        start = monotonic()
+        with self._lock:
+            self._reload()
+            restored = []
+            for target in targets:
+                for index, _, decode in self._codecs(target):
+                    items = [
+                        (name, FileSignature(mtime_ns, size, inode), decode(data))
+                        for name, mtime_ns, size, inode, data in self._db.execute(
+                            "SELECT name, mtime_ns, size, inode, data FROM files "
+                            "WHERE directory = ?",
+                            (index.path,),
+                        )
+                    ]
+                    restored.append((index, items))
+
+            snapshots = {}
+            for target, source, updated_at, gzipped in self._db.execute(
+                "SELECT target, source, updated_at, gzipped FROM snapshots"
+            ):
+                encoded = EncodedFamilies((), gzip.decompress(gzipped), gzipped)
+                snapshots[(target, source)] = (encoded, updated_at)
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'generation'")
+            generation = int(row[0]) if (row := row.fetchone()) else 0
+
+            files = 0
+            for index, items in restored:
+                index.restore(items)
+                files += len(items)
+            for key, (encoded, _) in snapshots.items():
+                self._saved_snapshots[key] = encoded
+            engine.restore(snapshots, generation)
+        logging.info(
+            f"Restored [{files}] files and [{len(snapshots)}] snapshots from "
+            f"[{self.path}] in {monotonic() - start:.2f}s"
+        )
+
+    def save(self, targets: List[Target], engine: SnapshotEngine):
+        # only what changed since the previous save is written
+        with self._lock:
+            try:
+                with self._db:
+                    self._write(targets, engine)
+            except Exception:
+                # rolled back, the ids and signatures noted during the write
+                # are not in the file
+                self._reload()
+                raise
+
+    def _write(self, targets: List[Target], engine: SnapshotEngine):
+        for target in targets:
+            for index, encode, _ in self._codecs(target):
+                saved = self._saved_files.setdefault(index.path, {})
+                seen = set()
+                for name, signature, entry in index.export():
+                    seen.add(name)
+                    if saved.get(name) != signature:
+                        self._db.execute(
+                            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                            (index.path, name, *signature, encode(entry)),
+                        )
+                        saved[name] = signature
+                for name in saved.keys() - seen:
+                    self._db.execute(
+                        "DELETE FROM files WHERE directory = ? AND name = ?",
+                        (index.path, name),
+                    )
+                    del saved[name]
+
+        for key, snapshot in engine.snapshots().items():
+            if self._saved_snapshots.get(key) is not snapshot.encoded:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?)",
+                    (*key, snapshot.updated_at, snapshot.encoded.gzipped),
+                )
+                self._saved_snapshots[key] = snapshot.encoded
+        self._db.execute(
+            "INSERT OR REPLACE INTO meta VALUES ('generation', ?)",
+            (str(engine.generation),),
+        )
+
+    def start(self, targets: List[Target], engine: SnapshotEngine, interval: float):
+        def run():
+            while not self._stop.wait(interval):
+                self._save_logged(targets, engine)
+
+        threading.Thread(target=run, name="state-save", daemon=True).start()
+
+    def stop(self, targets: List[Target], engine: SnapshotEngine):
+        self._stop.set()
+        self._save_logged(targets, engine)
+
+    def _save_logged(self, targets: List[Target], engine: SnapshotEngine):
+        start = monotonic()
+        try:
+            self.save(targets, engine)
+        except Exception:
+            logging.exception(f"Saving state to [{self.path}] failed")
+            return
+        logging.info(f"State saved to [{self.path}] in {monotonic() - start:.2f}s")
+
+
+def open_state(
+    path: str, targets: List[Target], engine: SnapshotEngine
+) -> Optional[StateStore]:
+    # a file that cannot be restored is deleted and the exporter starts cold,
+    # None when it cannot be created either
+    state = None
+    try:
+        state = StateStore(path)
+        state.restore(targets, engine)
+        return state
+    except Exception:
+        logging.exception(f"Discarded state [{path}], it could not be restored")
+        if state:
+            state.close()
+    try:
+        for file in (path, f"{path}-journal"):
+            if os.path.exists(file):
+                os.remove(file)
+        return StateStore(path)
+    except Exception:
+        logging.exception(f"State disabled, [{path}] could not be created")
+        return None
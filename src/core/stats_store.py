@@ -0,0 +1,116 @@
+from array import array
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from src.tools.intern_table import InternTable, grow
+
+StatKey = Tuple[str, str, str]
+# metric key in _player_stats_metrics(), labels after "player", value in ticks
+Sample = Tuple[str, Tuple[str, ...], bool]
+
+
+class StatKeys(InternTable[StatKey]):
+    # Global table of the (category, mod, item) keys seen in any stats file.
+    # Each key is classified once, when it is first interned.
+
+    def __init__(self, classify: Callable[[StatKey], Optional[Sample]]):
+        super().__init__()
+        self.classify = classify
+        self.samples: List[Optional[Sample]] = []
+
+    def _added(self, key: StatKey):
+        self.samples.append(self.classify(key))
+
+
+class PlayerStats(NamedTuple):
+    keys: array
+    values: array
+
+    @classmethod
+    def build(cls, stat_keys: StatKeys, stats: Iterable[Tuple[StatKey, int]]):
+        # keys without metric (ignored or unsupported) are not stored
+        keys, values = array("q"), array("q")
+        ids, samples = stat_keys._ids, stat_keys.samples
+        for key, value in stats:
+            # known keys without the method call and lock
+            if (key_id := ids.get(key)) is None:
+                key_id = stat_keys.intern(key)
+            if samples[key_id] is not None:
+                keys.append(key_id)
+                values.append(value)
+        return cls(keys, values)
+
+
+class StatTotals:
+    # Sum of each stat key over every player, kept up to date by the stats
+    # index as player files change, instead of summing all players on refresh.
+
+    def __init__(self, stat_keys: StatKeys):
+        self.stat_keys = stat_keys
+        self.values = array("q")
+        # number of players having the key, a total of 0 is still exported
+        self.players = array("q")
+
+    def update(self, _, previous: Optional[PlayerStats], new: Optional[PlayerStats]):
+        grow(len(self.stat_keys), self.values, self.players)
+        for player_stats, sign in ((previous, -1), (new, 1)):
+            if player_stats is None:
+                continue
+            for key_id, value in zip(player_stats.keys, player_stats.values):
+                self.values[key_id] += sign * value
+                self.players[key_id] += sign
+
+
+# stat keys by their names in the files: every player file repeats the same
+# names, each is split once and its key shared by all players
+_keys_after_1_13: Dict[str, Dict[str, StatKey]] = {}
+_keys_before_1_13: Dict[str, StatKey] = {}
+
+
+def read_player_stats(player_stats: Dict) -> Iterator[Tuple[StatKey, int]]:
+    return (
+        fill_after_1_13(player_stats)
+        if player_stats.get("stats")
+        else fill_before_1_13(player_stats)
+    )
+
+
+def fill_after_1_13(
+    player_stats: Dict[str, Dict[str, Dict[str, int]]],
+) -> Iterator[Tuple[StatKey, int]]:
+    for category, sub in player_stats["stats"].items():
+        if (keys := _keys_after_1_13.get(category)) is None:
+            keys = _keys_after_1_13.setdefault(category, {})
+        for key, value in sub.items():
+            if (stat_key := keys.get(key)) is None:
+                mod, item = key.split(":")
+                stat_key = keys.setdefault(key, (category.split(":")[1], mod, item))
+            yield stat_key, value
+
+
+def fill_before_1_13(player_stats) -> Iterator[Tuple[StatKey, int]]:
+    for key, value in player_stats.items():
+        if (stat_key := _keys_before_1_13.get(key)) is None:
+            stat_key = _keys_before_1_13.setdefault(key, split_before_1_13(key))
+        yield stat_key, value
+
+
+def split_before_1_13(name: str) -> StatKey:
+    keys = name.split(".")[1:]  # ignore "stat"
+    if len(keys) == 3:
+        key, mod, item = keys
+    elif len(keys) == 2:
+        key, mod, item = keys[0], "minecraft", keys[1]
+    elif len(keys) > 3:
+        key, mod, item = keys[0], keys[1], ".".join(keys[2:])
+    else:
+        key, mod, item = keys[0], "", ""
+    return f"stat.{key}", mod, item
@@ -0,0 +1,115 @@
+import json
+import logging
+from typing import List, Optional
+
+from cachetools import TTLCache
+
+from src import (
+    ROOT_PATH,
+    WORLD_NAME,
+    FORGE_SERVER,
+    RCON_HOST,
+    RCON_PORT,
+    RCON_PASSWORD,
+    RCON_POOL_SIZE,
+    RCON_TIMEOUT,
+    TARGETS_FILE,
+    LOG_TAIL,
+    LOG_RECONCILE_INTERVAL,
+    REGION_SCAN,
+    REGION_RECENT_SECONDS,
+    SHARD_INDEX,
+    SHARD_COUNT,
+)
+from src.core.advancements import (
+    AdvancementTotals,
+    advancement_ids,
+    make_advancements_index,
+)
+from src.core.metrics import make_player_data_index
+from src.core.player_stats import make_stats_index, stat_keys
+from src.core.players import PlayerRegistry, make_shard_filter
+from src.core.regions import RegionScanner
+from src.core.server_log import ServerLog
+from src.core.stats_store import StatTotals
+from src.tools.aiorcon import AsyncRconClient
+from src.tools.rcon import RconPool
+
+# target served on /metrics when no targets file is given
+DEFAULT_TARGET = "default"
+
+
+class Target:
+    # One minecraft server: its folder, RCON connections and the state built
+    # from them. Parsed stat keys, file caches and worker pools are shared.
+
+    def __init__(
+        self,
+        name: str,
+        root: str,
+        world: str = "world",
+        forge: bool = False,
+        rcon_host: Optional[str] = None,
+        rcon_port: int = 25575,
+        rcon_password: Optional[str] = None,
+        log_tail: bool = False,
+        region_scan: bool = False,
+    ):
+        self.name = name
+        self.root = root
+        self.world = f"{root}/{world}"
+        self.forge = forge
+        self.rcon_enabled = bool(rcon_host and rcon_password)
+        self.rcon_pool = RconPool(
+            rcon_host,
+            rcon_port,
+            rcon_password,
+            size=RCON_POOL_SIZE,
+            timeout=RCON_TIMEOUT,
+        )
+        self.async_rcon_client = AsyncRconClient(
+            rcon_host, rcon_port, rcon_password, timeout=RCON_TIMEOUT
+        )
+        # results of the last commands, only used by the rcon source thread
+        self.players_online_cache = TTLCache(maxsize=1, ttl=60)
+        self.mods_cache = TTLCache(maxsize=1, ttl=600)
+        # the same shard of players for every target
+        accept = make_shard_filter(SHARD_INDEX, SHARD_COUNT)
+        self.players = PlayerRegistry(accept)
+        self.stat_totals = StatTotals(stat_keys)
+        self.stats_index = make_stats_index(self.world, self.stat_totals, accept)
+        self.player_data_index = make_player_data_index(self.world, accept)
+        self.advancement_totals = AdvancementTotals(advancement_ids)
+        self.advancements_index = make_advancements_index(
+            self.world, self.advancement_totals, accept
+        )
+        self.server_log = (
+            ServerLog(f"{root}/logs/latest.log", LOG_RECONCILE_INTERVAL)
+            if log_tail
+            else None
+        )
+        self.regions = (
+            RegionScanner(self.world, REGION_RECENT_SECONDS) if region_scan else None
+        )
+
+
+def load_targets() -> List[Target]:
+    if not TARGETS_FILE:
+        return [
+            Target(
+                DEFAULT_TARGET,
+                ROOT_PATH,
+                WORLD_NAME,
+                FORGE_SERVER,
+                RCON_HOST,
+                RCON_PORT,
+                RCON_PASSWORD,
+                LOG_TAIL,
+                REGION_SCAN,
+            )
+        ]
+    with open(TARGETS_FILE, "r") as fd:
+        config = json.load(fd)
+    targets = [Target(name, **options) for name, options in config.items()]
+    logging.info(f"Loaded targets [{', '.join(config)}] from [{TARGETS_FILE}]")
+    return targets
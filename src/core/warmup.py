@@ -0,0 +1,44 @@
+from array import array
+from typing import Dict, List, Tuple, Union
+
+from src.core.stats_store import StatKey, read_player_stats
+from src.tools.json_reader import read_json
+from src.tools.nbt_reader import read_nbt_tags
+
+# Parsers run in the warm-up worker processes. They only import stdlib and
+# parsing modules, and return compact picklable records instead of parsed
+# documents. Errors are returned (as plain ValueError, some exceptions cannot
+# be unpickled) so one bad file does not fail its whole chunk.
+
+StatsRecord = Tuple[Tuple[StatKey, ...], array]
+
+
+def parse_stats_chunk(paths: List[str]) -> List[Union[StatsRecord, Exception]]:
+    # keys are shared between the records of a chunk, so pickle sends each
+    # distinct key once per chunk
+    shared: Dict[StatKey, StatKey] = {}
+    records = []
+    for path in paths:
+        try:
+            player_stats = read_json(path) or {}
+            keys, values = [], array("q")
+            for key, value in read_player_stats(player_stats):
+                keys.append(shared.setdefault(key, key))
+                values.append(value)
+            records.append((tuple(keys), values))
+        except Exception as e:
+            records.append(ValueError(f"{type(e).__name__}: {e}"))
+    return records
+
+
+def parse_player_data_chunk(
+    paths: List[str], tags: Tuple[str, ...]
+) -> List[Union[Tuple[float, ...], Exception]]:
+    records = []
+    for path in paths:
+        try:
+            data = read_nbt_tags(path, tags)
+            records.append(tuple(data[tag] for tag in tags))
+        except Exception as e:
+            records.append(ValueError(f"{type(e).__name__}: {e}"))
+    return records
@@ -1,45 +1,203 @@
+import atexit
 import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, List
+
 import uvicorn
-from prometheus_client import REGISTRY, make_asgi_app
-
-from src import RCON_ENABLED, FORGE_SERVER
-from src.core.metrics import (
-    players_online,
-    players_uuid_name,
-    world_infos,
-    player_data,
-    entities_loaded,
-    mods,
+from prometheus_client import REGISTRY
+
+from src import (
+    PLAYERS_REFRESH_INTERVAL,
+    LEVEL_REFRESH_INTERVAL,
+    RCON_REFRESH_INTERVAL,
+    ADVANCEMENTS_REFRESH_INTERVAL,
+    LOG_REFRESH_INTERVAL,
+    REGION_REFRESH_INTERVAL,
+    REGION_ENTITIES,
+    REGION_SAMPLE_INTERVAL,
+    RCON_ASYNC,
+    WARMUP_WORKERS,
+    WARMUP_CHUNK_SIZE,
+    SCRAPE_MIN_INTERVAL,
+    TARGETS_FILE,
+    PROFILE_TOKEN,
+    STATE_FILE,
+    STATE_SAVE_INTERVAL,
+    SHARD_INDEX,
+    SHARD_COUNT,
+)
+from src.core.datasource import change_watcher, json_file_cache, level_data_cache
+from src.core.snapshot import Source, SnapshotEngine, SnapshotCollector
+from src.core.sources import (
+    collect_advancements,
+    collect_entities,
+    collect_level,
+    collect_log,
+    collect_players,
+    collect_regions,
+    collect_rcon,
+    collect_rcon_async,
 )
-from src.core.player_stats import player_stats_metrics
-from src.core.datasource import load_players
+from src.core.state import open_state
+from src.core.target import DEFAULT_TARGET, Target, load_targets
+from src.tools.exposition import ExpositionApp
+from src.tools.file_cache import FileCacheCollector
+
+
+def make_warm_up(targets: List[Target]) -> Callable[[Target], None]:
+    # one pool for the warm-up of every target, shut down after the last one
+    pool = (
+        ProcessPoolExecutor(
+            WARMUP_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+        if WARMUP_WORKERS >= 2
+        else None
+    )
+    pending = {target.name for target in targets}
+    lock = threading.Lock()
+
+    def warm_up_players(target: Target):
+        # parse every file of a cold start in parallel
+        try:
+            if pool:
+                for index in (target.stats_index, target.player_data_index):
+                    index.refresh(pool, WARMUP_CHUNK_SIZE)
+        finally:
+            with lock:
+                pending.discard(target.name)
+                if not pending and pool:
+                    pool.shutdown()
 
+    return warm_up_players
 
-class MinecraftCollector:
-    def collect(self):
-        if RCON_ENABLED:
-            yield players_online()
-            if FORGE_SERVER:
-                yield entities_loaded()
-                yield mods()
 
-        yield players_uuid_name()
-        yield world_infos()
+def make_sources(targets: List[Target]) -> List[Source]:
+    warm_up_players = make_warm_up(targets)
+    sources = []
+    for target in targets:
+        sources.append(
+            Source(
+                "players",
+                PLAYERS_REFRESH_INTERVAL,
+                partial(collect_players, target),
+                partial(warm_up_players, target),
+                target.name,
+            )
+        )
+        if ADVANCEMENTS_REFRESH_INTERVAL:
+            sources.append(
+                Source(
+                    "advancements",
+                    ADVANCEMENTS_REFRESH_INTERVAL,
+                    partial(collect_advancements, target),
+                    target=target.name,
+                )
+            )
+        if SHARD_INDEX:
+            # server wide sources are only refreshed by the shard 0
+            continue
+        sources.append(
+            Source(
+                "level",
+                LEVEL_REFRESH_INTERVAL,
+                partial(collect_level, target),
+                target=target.name,
+            )
+        )
+        if target.regions:
+            sources.append(
+                Source(
+                    "regions",
+                    REGION_REFRESH_INTERVAL,
+                    partial(collect_regions, target),
+                    target=target.name,
+                )
+            )
+            if REGION_ENTITIES:
+                sources.append(
+                    Source(
+                        "entities",
+                        REGION_SAMPLE_INTERVAL,
+                        partial(collect_entities, target),
+                        target=target.name,
+                    )
+                )
+        if target.server_log:
+            sources.append(
+                Source(
+                    "log",
+                    LOG_REFRESH_INTERVAL,
+                    partial(collect_log, target),
+                    target=target.name,
+                )
+            )
+        if target.rcon_enabled:
+            sources.append(
+                Source(
+                    "rcon",
+                    RCON_REFRESH_INTERVAL,
+                    partial(collect_rcon_async if RCON_ASYNC else collect_rcon, target),
+                    target=target.name,
+                )
+            )
+    return sources
 
-        for player in load_players():
 
-            for metric in player_data(player["uuid"], player["name"]).values():
-                yield metric
+def create_app() -> ExpositionApp:
+    # only called by the serving process: the warm-up workers import this
+    # module again and must not start anything
+    targets = load_targets()
+    for target in targets:
+        logging.info(
+            f"Target [{target.name}] RCON is "
+            f"[{'ENABLED' if target.rcon_enabled else 'DISABLED'}]"
+        )
+    engine = SnapshotEngine(make_sources(targets))
+    if STATE_FILE and (state := open_state(STATE_FILE, targets, engine)):
+        state.start(targets, engine, STATE_SAVE_INTERVAL)
+        atexit.register(state.stop, targets, engine)
+    engine.start()
 
-            for metric in player_stats_metrics(player["uuid"], player["name"]).values():
-                yield metric
+    if change_watcher:
+        for target in targets:
+            for directory in (
+                target.root,
+                f"{target.world}/stats",
+                f"{target.world}/playerdata",
+            ):
+                change_watcher.subscribe(
+                    directory, partial(engine.wake, target.name, "players")
+                )
+            change_watcher.subscribe(
+                target.world, partial(engine.wake, target.name, "level")
+            )
+            change_watcher.subscribe(
+                f"{target.world}/advancements",
+                partial(engine.wake, target.name, "advancements"),
+            )
 
+    REGISTRY.register(SnapshotCollector(engine))
+    REGISTRY.register(
+        FileCacheCollector({"json": json_file_cache, "level": level_data_cache})
+    )
 
-REGISTRY.register(MinecraftCollector())
+    app = ExpositionApp(
+        engine.encoded,
+        REGISTRY,
+        SCRAPE_MIN_INTERVAL,
+        default_target=None if TARGETS_FILE else DEFAULT_TARGET,
+        profile=engine.profile,
+        profile_token=PROFILE_TOKEN,
+    )
+    REGISTRY.register(app)
+    return app
 
-app = make_asgi_app()
 
 if __name__ == "__main__":
     logging.info(f"Start on port [8000]")
-    logging.info(f"RCON is [{'ENABLED' if RCON_ENABLED else 'DISABLED'}]")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    if SHARD_COUNT > 1:
+        logging.info(f"Shard [{SHARD_INDEX}] of [{SHARD_COUNT}]")
+    uvicorn.run(create_app(), host="0.0.0.0", port=8000)
@@ -0,0 +1,88 @@
+import asyncio
+import struct
+from itertools import count
+from typing import Optional, Tuple
+
+from src.tools.rcon import (
+    SERVERDATA_AUTH,
+    Exchange,
+    RconError,
+    decode_packet,
+    encode_packet,
+)
+
+
+class AsyncRconClient:
+    # Servers read one packet per read() and drop the connection when it holds
+    # more, so the commands of a client wait for each other on a lock and only
+    # one packet is in flight. Each target has its own client, the commands of
+    # different targets run concurrently.
+
+    def __init__(self, host: str, port: int, password: str, timeout: float = 5.0):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.timeout = timeout
+        self._ids = count(1)
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def command(self, command: str) -> str:
+        if self._lock is None:
+            # created lazily so it belongs to the running loop
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            try:
+                return await asyncio.wait_for(self._command(command), self.timeout)
+            except BaseException:
+                # timed out, lost or cancelled in the middle of a response, the
+                # next command reconnects
+                self._disconnect()
+                raise
+
+    async def close(self):
+        self._disconnect()
+
+    async def _command(self, command: str) -> str:
+        if self._writer is not None:
+            try:
+                return await self._exchange(command)
+            except (OSError, RconError):
+                # closed by a server restart, retry on a fresh connection
+                self._disconnect()
+        await self._connect()
+        return await self._exchange(command)
+
+    async def _exchange(self, command: str) -> str:
+        exchange = Exchange(command, self._ids)
+        data = exchange.outgoing
+        while exchange.response is None:
+            if data:
+                await self._send(data)
+            request_id, _, payload = await self._receive()
+            data = exchange.receive(request_id, payload)
+        return exchange.response
+
+    async def _connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        await self._send(encode_packet(next(self._ids), SERVERDATA_AUTH, self.password))
+        request_id, _, _ = await self._receive()
+        if request_id == -1:
+            raise RconError("Authentication failed")
+
+    def _disconnect(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def _send(self, data: bytes):
+        self._writer.write(data)
+        await self._writer.drain()
+
+    async def _receive(self) -> Tuple[int, int, str]:
+        try:
+            (length,) = struct.unpack("<i", await self._reader.readexactly(4))
+            return decode_packet(await self._reader.readexactly(length))
+        except asyncio.IncompleteReadError:
+            raise RconError("Connection closed by server")
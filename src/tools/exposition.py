@@ -0,0 +1,221 @@
+import asyncio
+import gzip
+import hashlib
+import hmac
+import marshal
+import secrets
+from time import monotonic
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qs
+
+from prometheus_client import REGISTRY
+from prometheus_client.exposition import CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client.metrics_core import CounterMetricFamily, Metric
+
+EMPTY_GZIP = gzip.compress(b"")
+MAX_PROFILE_SECONDS = 60
+
+
+class EncodedFamilies(NamedTuple):
+    # name, fingerprint and end offset in text of each family
+    index: Tuple[Tuple[str, bytes, int], ...]
+    text: bytes
+    # a gzip member on its own, members of several sources are concatenated as is
+    gzipped: bytes
+
+
+class _Families:
+    def __init__(self, families: Iterable[Metric]):
+        self.families = families
+
+    def collect(self):
+        return self.families
+
+
+def encode_family(family: Metric) -> bytes:
+    return generate_latest(_Families((family,)))
+
+
+def fingerprint(family: Metric) -> bytes:
+    # stands for the family between two refreshes instead of keeping it,
+    # marshal serializes the samples (as plain tuples) at C speed
+    data = (family.name, family.documentation, family.type)
+    data += tuple(map(tuple, family.samples))
+    return hashlib.blake2b(marshal.dumps(data), digest_size=16).digest()
+
+
+def encode_families(
+    families: Iterable[Metric], previous: Optional[EncodedFamilies] = None
+) -> EncodedFamilies:
+    # families with the fingerprint of the previous ones keep their text, only
+    # changed ones are encoded again
+    known = {}
+    if previous:
+        start = 0
+        for name, old_fingerprint, end in previous.index:
+            known[name] = old_fingerprint, start, end
+            start = end
+    index, chunks, end = [], [], 0
+    for family in families:
+        family_fingerprint = fingerprint(family)
+        old_fingerprint, start, old_end = known.get(family.name, (None, 0, 0))
+        if family_fingerprint == old_fingerprint:
+            chunks.append(previous.text[start:old_end])
+        else:
+            chunks.append(encode_family(family))
+        end += len(chunks[-1])
+        index.append((family.name, family_fingerprint, end))
+
+    index = tuple(index)
+    # a restored encoding has no index, it is replaced once
+    if previous and previous.index == index:
+        return previous
+    text = b"".join(chunks)
+    return EncodedFamilies(index, text, gzip.compress(text))
+
+
+def _etag_matches(etag: str, if_none_match: str) -> bool:
+    # weak comparison, as required for If-None-Match
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+class ExpositionApp:
+    # serves pre-encoded families plus the metrics of a registry, which are
+    # collected for the request and should stay small (exporter own metrics)
+    def __init__(
+        self,
+        current: Callable[[str], Optional[Tuple[int, Iterable[EncodedFamilies]]]],
+        registry=REGISTRY,
+        min_interval: float = 0,
+        default_target: Optional[str] = None,
+        profile: Optional[Callable[[float], Optional[str]]] = None,
+        profile_token: Optional[str] = None,
+    ):
+        self.current = current
+        self.default_target = default_target
+        # /debug/profile is only served when a token is set
+        self.profile = profile
+        self.profile_token = profile_token
+        self.registry = registry
+        self.min_interval = min_interval
+        self.scrapes = 0
+        self.coalesced = 0
+        self._inflight: Optional[asyncio.Future] = None
+        self._last: Optional[Tuple[float, Tuple[bytes, bytes]]] = None
+        # generations start again in each process, or roll back to the saved
+        # state, so tags of another process never match
+        self._instance = secrets.token_hex(4)
+
+    def collect(self):
+        yield CounterMetricFamily(
+            "mc_exporter_scrapes",
+            "Requests served with metrics",
+            value=self.scrapes,
+        )
+        yield CounterMetricFamily(
+            "mc_exporter_scrapes_coalesced",
+            "Requests served by another request collection",
+            value=self.coalesced,
+        )
+
+    def _collect_registry(self) -> Tuple[bytes, bytes]:
+        text = generate_latest(self.registry)
+        return text, gzip.compress(text, compresslevel=1)
+
+    async def collect_registry(self) -> Tuple[bytes, bytes]:
+        # single flight: concurrent requests share the collection in progress,
+        # and a collection younger than min_interval is served again
+        if self._last and monotonic() - self._last[0] < self.min_interval:
+            self.coalesced += 1
+            return self._last[1]
+        if self._inflight:
+            self.coalesced += 1
+            return await asyncio.shield(self._inflight)
+
+        loop = asyncio.get_running_loop()
+        self._inflight = loop.run_in_executor(None, self._collect_registry)
+        try:
+            # shielded, a client going away does not cancel the others' result
+            result = await asyncio.shield(self._inflight)
+        finally:
+            self._inflight = None
+        self._last = (monotonic(), result)
+        return result
+
+    async def __call__(self, scope, receive, send):
+        assert scope.get("type") == "http"
+        headers = {
+            name.decode("latin-1"): value.decode("latin-1")
+            for name, value in scope.get("headers", [])
+        }
+        status, response_headers, body = await self._respond(scope, headers)
+
+        payload = await receive()
+        if payload.get("type") == "http.request":
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": status,
+                    "headers": response_headers,
+                }
+            )
+            await send({"type": "http.response.body", "body": body})
+
+    async def _profile(self, params: Dict[str, List[str]], headers: Dict[str, str]):
+        if not (self.profile and self.profile_token):
+            return 404, [], b"Not found"
+        token = params.get("token", [""])[0]
+        if authorization := headers.get("authorization", ""):
+            token = authorization.removeprefix("Bearer ")
+        if not hmac.compare_digest(token.encode(), self.profile_token.encode()):
+            return 403, [], b"Invalid token"
+        try:
+            seconds = float(params.get("seconds", ["10"])[0])
+        except ValueError:
+            return 400, [], b"Invalid seconds parameter"
+        seconds = min(max(seconds, 0.1), MAX_PROFILE_SECONDS)
+
+        loop = asyncio.get_running_loop()
+        if (report := await loop.run_in_executor(None, self.profile, seconds)) is None:
+            return 409, [], b"A profile is already running"
+        return 200, [(b"content-type", b"text/plain; charset=utf-8")], report.encode()
+
+    async def _respond(self, scope, headers: Dict[str, str]):
+        params = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        if scope.get("path") == "/debug/profile":
+            return await self._profile(params, headers)
+
+        # /probe?target=<name> serves the families of one target only, any
+        # other path those of the default target plus the registry metrics
+        probe = scope.get("path") == "/probe"
+        if probe:
+            target = params.get("target", [None])[0]
+            if target is None:
+                return 400, [], b"Missing target parameter"
+        else:
+            target = self.default_target
+
+        if (current := self.current(target)) is None:
+            if probe:
+                return 404, [], f"Unknown target [{target}]".encode()
+            current = 0, []
+        generation, encoded = current
+        # weak: registry metrics (snapshot age, caches...) are not part of the
+        # generation, the same tag means the same game data
+        etag = f'W/"{self._instance}-{generation}"'
+        response_headers = [(b"etag", etag.encode()), (b"vary", b"Accept-Encoding")]
+        if _etag_matches(etag, headers.get("if-none-match", "")):
+            return 304, response_headers, b""
+
+        self.scrapes += 1
+        response_headers.append((b"content-type", CONTENT_TYPE_LATEST.encode()))
+        text, gzipped = (b"", EMPTY_GZIP) if probe else await self.collect_registry()
+        if "gzip" in headers.get("accept-encoding", ""):
+            response_headers.append((b"content-encoding", b"gzip"))
+            return (
+                200,
+                response_headers,
+                b"".join([e.gzipped for e in encoded] + [gzipped]),
+            )
+        return 200, response_headers, b"".join([e.text for e in encoded] + [text])
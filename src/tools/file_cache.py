@@ -1,27 +1,103 @@
-import json
 import logging
 import os
+import sys
+import threading
+from collections import OrderedDict
 from time import time
-from typing import Dict
+from typing import Any, Dict, NamedTuple, Optional, Tuple
 
-from nbt import nbt
+from prometheus_client.metrics_core import CounterMetricFamily, GaugeMetricFamily
+
+from src.tools.inotify import InotifyWatcher
+from src.tools.instrumentation import PARSE_ERRORS, STAGE_DURATION
+from src.tools.json_reader import read_json
+from src.tools.nbt_reader import read_nbt_tags
+
+
+class CacheEntry(NamedTuple):
+    value: Any
+    loaded_at: float
+    size: int
+
+
+def approximate_size(value) -> int:
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(approximate_size(k) + approximate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set)):
+        size += sum(approximate_size(item) for item in value)
+    return size
 
 
 class BaseFileCache:
-    _cache_content: Dict = dict()
-    _cache_last_update: Dict = dict()
+    def __init__(
+        self,
+        watcher: Optional[InotifyWatcher] = None,
+        max_entries: int = 1024,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl: float = 0,
+    ):
+        self.watcher = watcher
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
 
     def __getitem__(self, item):
-        if (
-                item not in self._cache_last_update
-                or os.stat(item).st_mtime > self._cache_last_update[item]
-        ):
-            return self.__missing__(item)
-        return self._cache_content[item]
+        with self._lock:
+            entry = self._entries.get(item)
+            if entry is not None and self._is_fresh(item, entry):
+                self._entries.move_to_end(item)
+                self.hits += 1
+                return entry.value
+            self.misses += 1
+            self._pop(item)
+            if self.watcher:
+                self._watch(item)
+        return self.__missing__(item)
 
     def __setitem__(self, key, value):
-        self._cache_last_update[key] = time()
-        self._cache_content[key] = value
+        with self._lock:
+            self._pop(key)
+            entry = CacheEntry(value, time(), approximate_size(value))
+            self._entries[key] = entry
+            self.size += entry.size
+            # least recently used first, the new entry is always kept
+            while len(self._entries) > 1 and (
+                len(self._entries) > self.max_entries or self.size > self.max_bytes
+            ):
+                self._pop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _is_fresh(self, item: str, entry: CacheEntry) -> bool:
+        if self.ttl and time() - entry.loaded_at > self.ttl:
+            return False
+        if self.watcher:
+            if self.watcher.is_clean(item):
+                return True
+            self._watch(item)
+        try:
+            return os.stat(item).st_mtime <= entry.loaded_at
+        except FileNotFoundError:
+            return False
+
+    def _watch(self, item: str):
+        directory, name = os.path.split(item)
+        self.watcher.watch(directory, {name})
+        # cleared before reading so a save during the read is not missed
+        self.watcher.mark_clean(item)
+
+    def _pop(self, item: str):
+        if entry := self._entries.pop(item, None):
+            self.size -= entry.size
 
     def __missing__(self, key):
         with open(key, "r") as fd:
@@ -33,19 +109,69 @@ class BaseFileCache:
 class JsonFileCache(BaseFileCache):
     def __missing__(self, key):
         try:
-            with open(key, "r") as fd:
-                value = json.load(fd)
-                self[key] = value
-                return value
+            with STAGE_DURATION.labels("read", "json").time():
+                value = read_json(key)
+            self[key] = value
+            return value
         except FileNotFoundError:
             logging.error(f"File [{key}] not found")
+        except ValueError:
+            PARSE_ERRORS.labels("json").inc()
+            raise
 
 
 class NbtFileCache(BaseFileCache):
+    def __init__(self, tags: Tuple[str, ...], **kwargs):
+        super().__init__(**kwargs)
+        self.tags = tags
+
     def __missing__(self, key):
         try:
-            value = nbt.NBTFile(key, "rb")
+            with STAGE_DURATION.labels("read", "nbt").time():
+                value = read_nbt_tags(key, self.tags)
             self[key] = value
             return value
         except FileNotFoundError:
             logging.error(f"File [{key}] not found")
+        except (ValueError, EOFError, OSError):
+            PARSE_ERRORS.labels("nbt").inc()
+            raise
+
+
+class FileCacheCollector:
+    def __init__(self, caches: Dict[str, BaseFileCache]):
+        self.caches = caches
+
+    def collect(self):
+        hits = CounterMetricFamily(
+            "mc_exporter_file_cache_hits",
+            "Number of reads served from the file cache",
+            labels=("cache",),
+        )
+        misses = CounterMetricFamily(
+            "mc_exporter_file_cache_misses",
+            "Number of reads that loaded the file",
+            labels=("cache",),
+        )
+        evictions = CounterMetricFamily(
+            "mc_exporter_file_cache_evictions",
+            "Number of entries evicted to stay within the cache limits",
+            labels=("cache",),
+        )
+        entries = GaugeMetricFamily(
+            "mc_exporter_file_cache_entries",
+            "Number of entries in the file cache",
+            labels=("cache",),
+        )
+        size = GaugeMetricFamily(
+            "mc_exporter_file_cache_bytes",
+            "Approximate memory used by the file cache entries",
+            labels=("cache",),
+        )
+        for name, cache in self.caches.items():
+            hits.add_metric((name,), cache.hits)
+            misses.add_metric((name,), cache.misses)
+            evictions.add_metric((name,), cache.evictions)
+            entries.add_metric((name,), len(cache))
+            size.add_metric((name,), cache.size)
+        yield from (hits, misses, evictions, entries, size)
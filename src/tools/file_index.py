@@ -0,0 +1,234 @@
+import logging
+import os
+from concurrent.futures import Executor
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from src.tools.inotify import InotifyWatcher
+from src.tools.instrumentation import (
+    FILES_PARSED,
+    FILES_SKIPPED,
+    PARSE_ERRORS,
+    STAGE_DURATION,
+)
+
+
+class FileSignature(NamedTuple):
+    mtime_ns: int
+    size: int
+    inode: int
+
+    @classmethod
+    def of(cls, stat: os.stat_result) -> "FileSignature":
+        return cls(stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+_Pending = Tuple[str, str, FileSignature]
+
+
+class DirectoryIndex:
+    def __init__(
+        self,
+        path: str,
+        suffix: str,
+        parse: Callable[[str], Any],
+        watcher: Optional[InotifyWatcher] = None,
+        parse_chunk: Optional[Callable[[List[str]], List[Any]]] = None,
+        finish: Callable[[Any], Any] = lambda record: record,
+        # called with (key, previous entry, new entry), None when absent
+        on_update: Optional[Callable[[str, Any, Any], None]] = None,
+        # files whose key is rejected are neither parsed nor indexed
+        accept: Optional[Callable[[str], bool]] = None,
+    ):
+        self.path = path
+        # label of the instrumentation metrics: "stats", "playerdata"
+        self.name = os.path.basename(path)
+        self.suffix = suffix
+        self.parse = parse
+        self.watcher = watcher
+        self.parse_chunk = parse_chunk
+        self.finish = finish
+        self.on_update = on_update
+        self.accept = accept
+        self._signatures: Dict[str, FileSignature] = {}
+        self._entries: Dict[str, Any] = {}
+        self._failed: Set[str] = set()
+        # logged once, e.g. advancements/ only appears with the first player
+        self._missing = False
+        if watcher:
+            watcher.watch(path)
+
+    def __getitem__(self, key: str):
+        return self._entries[key]
+
+    def __contains__(self, key: str):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str, default=None):
+        return self._entries.get(key, default)
+
+    def items(self):
+        return self._entries.items()
+
+    def signature(self, key: str) -> Optional[FileSignature]:
+        return self._signatures.get(key)
+
+    def export(self) -> List[Tuple[str, FileSignature, Any]]:
+        # dict copies are atomic, so this is safe while another thread
+        # refreshes; signatures are copied first so none is newer than its entry
+        signatures = dict(self._signatures)
+        entries = dict(self._entries)
+        return [
+            (key, signature, entries[key])
+            for key, signature in signatures.items()
+            if key in entries
+        ]
+
+    def restore(self, items: Iterable[Tuple[str, FileSignature, Any]]):
+        # entries saved by a previous run, the next refresh only parses the
+        # files whose signature changed since
+        for key, signature, entry in items:
+            if not self.accept or self.accept(key):
+                self._store(key, entry, signature)
+
+    def refresh(
+        self, executor: Optional[Executor] = None, chunk_size: int = 256
+    ) -> Tuple[Set[str], Set[str]]:
+        names = self.watcher.drain(self.path) if self.watcher else None
+        failed, self._failed = self._failed, set()
+        with STAGE_DURATION.labels("scan", self.name).time():
+            if names is None:
+                pending, removed = self._scan()
+            else:
+                pending, removed = self._check(names | failed)
+        for key in removed:
+            self._remove(key)
+        with STAGE_DURATION.labels("parse", self.name).time():
+            if executor and self.parse_chunk and len(pending) > chunk_size:
+                changed = self._load_parallel(pending, executor, chunk_size)
+            else:
+                changed = self._load_all(pending)
+        FILES_PARSED.labels(self.name).inc(len(changed))
+        FILES_SKIPPED.labels(self.name).inc(len(self._entries) - len(changed))
+        return changed, removed
+
+    def _scan(self) -> Tuple[List[_Pending], Set[str]]:
+        pending, seen = [], set()
+        try:
+            with os.scandir(self.path) as entries:
+                for entry in entries:
+                    if not entry.name.endswith(self.suffix):
+                        continue
+                    key = entry.name[: -len(self.suffix)]
+                    if self.accept and not self.accept(key):
+                        continue
+                    try:
+                        signature = FileSignature.of(entry.stat())
+                    except FileNotFoundError:
+                        continue
+                    seen.add(key)
+                    if self._signatures.get(key) != signature:
+                        pending.append((key, entry.path, signature))
+        except FileNotFoundError:
+            if not self._missing:
+                logging.error(f"Directory [{self.path}] not found")
+                self._missing = True
+        else:
+            if self._missing:
+                logging.info(f"Directory [{self.path}] found")
+                self._missing = False
+        return pending, self._entries.keys() - seen
+
+    def _check(self, names: Set[str]) -> Tuple[List[_Pending], Set[str]]:
+        pending, removed = [], set()
+        for name in names:
+            if not name.endswith(self.suffix):
+                continue
+            key = name[: -len(self.suffix)]
+            if self.accept and not self.accept(key):
+                continue
+            path = os.path.join(self.path, name)
+            try:
+                signature = FileSignature.of(os.stat(path))
+            except FileNotFoundError:
+                if key in self._entries:
+                    removed.add(key)
+                continue
+            if self._signatures.get(key) != signature:
+                pending.append((key, path, signature))
+        return pending, removed
+
+    def _remove(self, key: str):
+        previous = self._entries.pop(key)
+        self._signatures.pop(key, None)
+        if self.on_update:
+            self.on_update(key, previous, None)
+
+    def _store(self, key: str, entry: Any, signature: FileSignature):
+        previous = self._entries.get(key)
+        self._entries[key] = entry
+        self._signatures[key] = signature
+        if self.on_update:
+            self.on_update(key, previous, entry)
+
+    def _load_all(self, pending: List[_Pending]) -> Set[str]:
+        changed = set()
+        for key, path, signature in pending:
+            try:
+                entry = self.parse(path)
+            except Exception as e:
+                self._parse_failed(path, e)
+                continue
+            self._store(key, entry, signature)
+            changed.add(key)
+        return changed
+
+    def _load_parallel(
+        self, pending: List[_Pending], executor: Executor, chunk_size: int
+    ) -> Set[str]:
+        # parse_chunk runs in the executor (possibly another process) and
+        # returns compact records, turned into entries here by finish
+        chunks = [
+            pending[i : i + chunk_size] for i in range(0, len(pending), chunk_size)
+        ]
+        try:
+            futures = [
+                executor.submit(self.parse_chunk, [path for _, path, _ in chunk])
+                for chunk in chunks
+            ]
+        except Exception as e:
+            logging.error(f"Parallel parsing of [{self.path}] failed: {e}")
+            return self._load_all(pending)
+        changed = set()
+        for chunk, future in zip(chunks, futures):
+            try:
+                records = future.result()
+            except Exception as e:
+                logging.error(f"Parallel parsing of [{self.path}] failed: {e}")
+                changed |= self._load_all(chunk)
+                continue
+            for (key, path, signature), record in zip(chunk, records):
+                if isinstance(record, Exception):
+                    self._parse_failed(path, record)
+                    continue
+                self._store(key, self.finish(record), signature)
+                changed.add(key)
+        return changed
+
+    def _parse_failed(self, path: str, error: Exception):
+        # keep the previous entry, the file is parsed again on next refresh
+        logging.error(f"Failed to parse [{path}]: {error}")
+        PARSE_ERRORS.labels(self.name).inc()
+        self._failed.add(os.path.basename(path))
@@ -0,0 +1,186 @@
+import ctypes
+import logging
+import os
+import select
+import struct
+import threading
+from typing import Callable, Dict, List, Optional, Set
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+
+# Minecraft saves `.dat` files by writing a temporary file and renaming it over
+# the previous one, so directories are watched (not files) and renames count as
+# changes.
+WATCH_MASK = (
+    IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+)
+
+_EVENT = struct.Struct("iIII")
+
+
+class _Watch:
+    def __init__(self, path: str):
+        self.path = path
+        self.names: Optional[Set[str]] = set()
+        self.dirty: Set[str] = set()
+        self.rescan = True
+        self.callbacks: List[Callable[[], None]] = []
+        self.wd: Optional[int] = None
+
+
+class InotifyWatcher:
+    def __init__(self):
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._lock = threading.Lock()
+        self._watches: Dict[str, _Watch] = {}
+        self._by_wd: Dict[int, _Watch] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="inotify", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def create(cls) -> Optional["InotifyWatcher"]:
+        try:
+            return cls()
+        except (OSError, AttributeError) as e:
+            logging.warning(f"inotify unavailable, fallback to polling: {e}")
+            return None
+
+    def watch(self, directory: str, names: Optional[Set[str]] = None):
+        with self._lock:
+            watch = self._get_watch(directory)
+            if names is None or watch.names is None:
+                watch.names = None
+            else:
+                watch.names |= names
+
+    def subscribe(self, directory: str, callback: Callable[[], None]):
+        with self._lock:
+            self._get_watch(directory).callbacks.append(callback)
+
+    def drain(self, directory: str) -> Optional[Set[str]]:
+        # None means "unknown": the directory is not (or no longer) watched or
+        # events were lost, and the caller must fall back to a full scan
+        with self._lock:
+            watch = self._watches.get(directory)
+            if watch is None:
+                return None
+            if watch.wd is None:
+                self._add_watch(watch)
+            if watch.wd is None or watch.rescan:
+                watch.rescan = False
+                watch.dirty.clear()
+                return None
+            dirty, watch.dirty = watch.dirty, set()
+            return dirty
+
+    def is_clean(self, path: str) -> bool:
+        directory, name = os.path.split(path)
+        with self._lock:
+            watch = self._watches.get(directory)
+            return (
+                watch is not None
+                and watch.wd is not None
+                and not watch.rescan
+                and name not in watch.dirty
+            )
+
+    def mark_clean(self, path: str):
+        directory, name = os.path.split(path)
+        with self._lock:
+            if watch := self._watches.get(directory):
+                watch.dirty.discard(name)
+                if watch.names is not None and watch.names <= {name}:
+                    watch.rescan = False
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        os.close(self._fd)
+
+    def _get_watch(self, directory: str) -> _Watch:
+        watch = self._watches.get(directory)
+        if watch is None:
+            watch = self._watches[directory] = _Watch(directory)
+        self._add_watch(watch)
+        return watch
+
+    def _add_watch(self, watch: _Watch):
+        if watch.wd is not None:
+            return
+        wd = self._libc.inotify_add_watch(self._fd, watch.path.encode(), WATCH_MASK)
+        if wd < 0:
+            logging.error(
+                f"Cannot watch [{watch.path}]: {os.strerror(ctypes.get_errno())}"
+            )
+            return
+        watch.wd = wd
+        self._by_wd[wd] = watch
+
+    def _run(self):
+        while not self._stop.is_set():
+            readable, _, _ = select.select([self._fd], [], [], 1.0)
+            if not readable:
+                continue
+            try:
+                buffer = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            self._handle(buffer)
+
+    def _handle(self, buffer: bytes):
+        callbacks = set()
+        with self._lock:
+            offset = 0
+            while offset < len(buffer):
+                wd, mask, _, length = _EVENT.unpack_from(buffer, offset)
+                offset += _EVENT.size
+                name = buffer[offset : offset + length].rstrip(b"\0").decode()
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    # events were dropped: force a full scan of every directory
+                    for watch in self._watches.values():
+                        watch.rescan = True
+                        callbacks.update(watch.callbacks)
+                    continue
+
+                watch = self._by_wd.get(wd)
+                if watch is None:
+                    continue
+                if mask & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+                    self._forget(watch)
+                    callbacks.update(watch.callbacks)
+                elif name and (watch.names is None or name in watch.names):
+                    watch.dirty.add(name)
+                    callbacks.update(watch.callbacks)
+
+        for callback in callbacks:
+            callback()
+
+    def _forget(self, watch: _Watch):
+        if watch.wd is not None:
+            self._libc.inotify_rm_watch(self._fd, watch.wd)
+            self._by_wd.pop(watch.wd, None)
+            watch.wd = None
+        watch.rescan = True
@@ -0,0 +1,56 @@
+import cProfile
+import io
+import pstats
+import tracemalloc
+from typing import List, Optional
+
+from prometheus_client import Counter, Histogram
+
+# Metrics of the exporter itself, registered in the default registry.
+
+STAGE_DURATION = Histogram(
+    "mc_exporter_stage_duration_seconds",
+    "Duration of each stage of a refresh: scan (stat of a directory), parse, "
+    "read (file cache), classify, collect and encode (whole source)",
+    ("stage", "name"),
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+RCON_DURATION = Histogram(
+    "mc_exporter_rcon_command_duration_seconds",
+    "Round trip of each RCON command",
+    ("command",),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+FILES_PARSED = Counter(
+    "mc_exporter_files_parsed", "Files parsed because they changed", ("type",)
+)
+FILES_SKIPPED = Counter(
+    "mc_exporter_files_skipped",
+    "Files not parsed again on a refresh because they did not change",
+    ("type",),
+)
+PARSE_ERRORS = Counter(
+    "mc_exporter_parse_errors", "Files that could not be parsed", ("type",)
+)
+
+
+def profile_report(
+    profiles: List[cProfile.Profile],
+    snapshot: Optional[tracemalloc.Snapshot],
+    limit: int = 40,
+) -> str:
+    out = io.StringIO()
+    profiles = [profile for profile in profiles if profile.getstats()]
+    if profiles:
+        stats = pstats.Stats(profiles[0], stream=out)
+        for profile in profiles[1:]:
+            stats.add(profile)
+        stats.sort_stats("cumulative").print_stats(limit)
+    else:
+        out.write("No refresh ran while profiling\n")
+
+    if snapshot:
+        out.write(f"\nTop {limit} allocations by line (tracemalloc)\n")
+        for stat in snapshot.statistics("lineno")[:limit]:
+            out.write(f"{stat}\n")
+    return out.getvalue()
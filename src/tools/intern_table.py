@@ -0,0 +1,41 @@
+import threading
+from array import array
+from typing import Dict, Generic, Hashable, List, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+
+
+class InternTable(Generic[K]):
+    # Append-only table giving each key a dense id, its index in `keys`, so
+    # per-key values can be kept in arrays indexed by id. Lookups of known
+    # keys take no lock; ids are never reused.
+
+    def __init__(self):
+        self.keys: List[K] = []
+        self._ids: Dict[K, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def intern(self, key: K) -> int:
+        key_id = self._ids.get(key)
+        if key_id is None:
+            with self._lock:
+                key_id = self._ids.get(key)
+                if key_id is None:
+                    self._added(key)
+                    self.keys.append(key)
+                    key_id = self._ids[key] = len(self.keys) - 1
+        return key_id
+
+    def _added(self, key: K):
+        # called under the lock before the key gets its id
+        pass
+
+
+def grow(size: int, *columns: array):
+    # zero-fill arrays indexed by id up to the size of their table
+    for column in columns:
+        if (missing := size - len(column)) > 0:
+            column.frombytes(bytes(missing * column.itemsize))
@@ -0,0 +1,31 @@
+import json
+import logging
+import mmap
+import os
+from typing import Any
+
+from src import JSON_DECODER
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Files are read as bytes and parsed without decoding them to str first.
+# orjson parses big files in place from a memory mapping.
+
+MMAP_MIN_SIZE = 1 << 20
+
+if JSON_DECODER == "orjson" and orjson is None:
+    logging.warning("orjson is not installed, fallback to the json module")
+backend = "orjson" if orjson and JSON_DECODER != "stdlib" else "stdlib"
+loads = orjson.loads if backend == "orjson" else json.loads
+
+
+def read_json(path: str) -> Any:
+    with open(path, "rb") as fd:
+        if backend == "orjson" and os.fstat(fd.fileno()).st_size >= MMAP_MIN_SIZE:
+            with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                with memoryview(view) as data:
+                    return loads(data)
+        return loads(fd.read())
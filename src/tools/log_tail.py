@@ -0,0 +1,71 @@
+import os
+from typing import BinaryIO, Callable, Iterator, Optional
+
+
+class LogTail:
+    # Follows a log file like `tail -F`: yields the complete lines appended
+    # since the last call, the file is reopened when it is rotated (new inode)
+    # or truncated, on_rotate is called between the lines of both files.
+
+    def __init__(
+        self,
+        path: str,
+        on_rotate: Optional[Callable[[], None]] = None,
+        chunk_size: int = 1 << 16,
+    ):
+        self.path = path
+        self.on_rotate = on_rotate
+        self.chunk_size = chunk_size
+        self._fd: Optional[BinaryIO] = None
+        self._inode: Optional[int] = None
+        self._partial = b""
+        self._opened = False
+
+    def lines(self) -> Iterator[str]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            stat = None
+
+        if self._fd is not None:
+            if stat is None or stat.st_ino != self._inode:
+                # lines written before the rename, then the last partial one
+                yield from self._read()
+                if self._partial:
+                    yield self._partial.decode(errors="replace")
+                # on_rotate is called when the new file is opened
+                self.close()
+            elif stat.st_size < self._fd.tell():
+                self._fd.seek(0)
+                self._partial = b""
+                self._rotated()
+
+        if self._fd is None and stat is not None:
+            try:
+                self._fd = open(self.path, "rb")
+            except FileNotFoundError:
+                return
+            self._inode = os.fstat(self._fd.fileno()).st_ino
+            if self._opened:
+                self._rotated()
+            self._opened = True
+
+        if self._fd is not None:
+            yield from self._read()
+
+    def _read(self) -> Iterator[str]:
+        while chunk := self._fd.read(self.chunk_size):
+            *lines, self._partial = (self._partial + chunk).split(b"\n")
+            for line in lines:
+                yield line.rstrip(b"\r").decode(errors="replace")
+
+    def _rotated(self):
+        if self.on_rotate:
+            self.on_rotate()
+
+    def close(self):
+        if self._fd is not None:
+            self._fd.close()
+        self._fd = None
+        self._inode = None
+        self._partial = b""
@@ -0,0 +1,187 @@
+import gzip
+import struct
+from typing import Any, Callable, Dict, Iterable, Tuple
+
+TAG_END = 0
+TAG_BYTE = 1
+TAG_SHORT = 2
+TAG_INT = 3
+TAG_LONG = 4
+TAG_FLOAT = 5
+TAG_DOUBLE = 6
+TAG_BYTE_ARRAY = 7
+TAG_STRING = 8
+TAG_LIST = 9
+TAG_COMPOUND = 10
+TAG_INT_ARRAY = 11
+TAG_LONG_ARRAY = 12
+
+_NUMBERS = {
+    TAG_BYTE: struct.Struct(">b"),
+    TAG_SHORT: struct.Struct(">h"),
+    TAG_INT: struct.Struct(">i"),
+    TAG_LONG: struct.Struct(">q"),
+    TAG_FLOAT: struct.Struct(">f"),
+    TAG_DOUBLE: struct.Struct(">d"),
+}
+_ARRAYS = {TAG_BYTE_ARRAY: "b", TAG_INT_ARRAY: "i", TAG_LONG_ARRAY: "q"}
+_ARRAY_SIZES = {TAG_BYTE_ARRAY: 1, TAG_INT_ARRAY: 4, TAG_LONG_ARRAY: 8}
+_LENGTH = struct.Struct(">i")
+_STRING_LENGTH = struct.Struct(">H")
+
+# tree of the requested tags: {"Data": {"Version": {"Name": None}}}, None is a leaf
+_Wanted = Dict[str, Any]
+
+
+class NbtError(ValueError):
+    pass
+
+
+def read_nbt_tags(path: str, tags: Iterable[str]) -> Dict[str, Any]:
+    with open(path, "rb") as fd:
+        data = fd.read()
+    if data[:2] == b"\x1f\x8b":
+        data = gzip.decompress(data)
+    return scan_nbt_tags(data, tags)
+
+
+def scan_nbt_tags(data: bytes, tags: Iterable[str]) -> Dict[str, Any]:
+    # `tags` are dotted paths from the root compound, e.g. "Data.Version.Name".
+    # Only the requested tags are decoded, everything else is skipped over.
+    return _scan(data, tags, _read)
+
+
+def scan_nbt_list_lengths(data: bytes, tags: Iterable[str]) -> Dict[str, int]:
+    # like scan_nbt_tags() for list tags, the items are skipped, not decoded
+    return _scan(data, tags, _read_length)
+
+
+def _scan(
+    data: bytes, tags: Iterable[str], read: Callable[[bytes, int, int], Tuple]
+) -> Dict[str, Any]:
+    wanted: _Wanted = {}
+    for tag in tags:
+        node = wanted
+        *parents, leaf = tag.split(".")
+        for parent in parents:
+            node = node.setdefault(parent, {})
+        node[leaf] = None
+
+    try:
+        if data[0] != TAG_COMPOUND:
+            raise NbtError("Root tag is not a compound")
+        _, offset = _read_string(data, 1)
+        result: Dict[str, Any] = {}
+        _scan_compound(data, offset, wanted, "", result, read)
+    except (IndexError, struct.error) as e:
+        raise NbtError(f"Truncated NBT data: {e}") from e
+    return result
+
+
+def _scan_compound(
+    data: bytes,
+    offset: int,
+    wanted: _Wanted,
+    prefix: str,
+    result: Dict[str, Any],
+    read: Callable[[bytes, int, int], Tuple],
+) -> Tuple[int, int, bool]:
+    # Returns the offset where the scan stopped, the number of requested tags
+    # not found and whether the end of the compound was reached: the scan stops
+    # as soon as every requested tag was read, without reading the remaining tags
+    remaining = _count_leaves(wanted)
+    while remaining:
+        tag_type = data[offset]
+        if tag_type == TAG_END:
+            return offset + 1, remaining, True
+        name, offset = _read_string(data, offset + 1)
+        if name not in wanted:
+            offset = _skip(data, offset, tag_type)
+            continue
+        sub = wanted[name]
+        if sub is None:
+            result[prefix + name], offset = read(data, offset, tag_type)
+            remaining -= 1
+        elif tag_type == TAG_COMPOUND:
+            offset, missing, complete = _scan_compound(
+                data, offset, sub, f"{prefix}{name}.", result, read
+            )
+            remaining -= _count_leaves(sub) - missing
+            if remaining and not complete:
+                offset = _skip(data, offset, TAG_COMPOUND)
+        else:
+            offset = _skip(data, offset, tag_type)
+    return offset, remaining, False
+
+
+def _count_leaves(wanted: _Wanted) -> int:
+    return sum(1 if sub is None else _count_leaves(sub) for sub in wanted.values())
+
+
+def _read_string(data: bytes, offset: int) -> Tuple[str, int]:
+    (length,) = _STRING_LENGTH.unpack_from(data, offset)
+    offset += 2
+    return data[offset : offset + length].decode("utf-8", "replace"), offset + length
+
+
+def _read(data: bytes, offset: int, tag_type: int) -> Tuple[Any, int]:
+    if number := _NUMBERS.get(tag_type):
+        return number.unpack_from(data, offset)[0], offset + number.size
+    if tag_type == TAG_STRING:
+        return _read_string(data, offset)
+    if tag_type in _ARRAYS:
+        (length,) = _LENGTH.unpack_from(data, offset)
+        offset += 4
+        size = _ARRAY_SIZES[tag_type]
+        values = struct.unpack_from(f">{length}{_ARRAYS[tag_type]}", data, offset)
+        return list(values), offset + length * size
+    if tag_type == TAG_LIST:
+        item_type = data[offset]
+        (length,) = _LENGTH.unpack_from(data, offset + 1)
+        offset += 5
+        values = []
+        for _ in range(length):
+            value, offset = _read(data, offset, item_type)
+            values.append(value)
+        return values, offset
+    if tag_type == TAG_COMPOUND:
+        values = {}
+        while (item_type := data[offset]) != TAG_END:
+            name, offset = _read_string(data, offset + 1)
+            values[name], offset = _read(data, offset, item_type)
+        return values, offset + 1
+    raise NbtError(f"Unknown tag type [{tag_type}]")
+
+
+def _read_length(data: bytes, offset: int, tag_type: int) -> Tuple[int, int]:
+    if tag_type != TAG_LIST:
+        raise NbtError(f"Tag type [{tag_type}] is not a list")
+    (length,) = _LENGTH.unpack_from(data, offset + 1)
+    return length, _skip(data, offset, tag_type)
+
+
+def _skip(data: bytes, offset: int, tag_type: int) -> int:
+    if number := _NUMBERS.get(tag_type):
+        return offset + number.size
+    if tag_type == TAG_STRING:
+        return offset + 2 + _STRING_LENGTH.unpack_from(data, offset)[0]
+    if tag_type in _ARRAYS:
+        length = _LENGTH.unpack_from(data, offset)[0]
+        return offset + 4 + length * _ARRAY_SIZES[tag_type]
+    if tag_type == TAG_LIST:
+        item_type = data[offset]
+        (length,) = _LENGTH.unpack_from(data, offset + 1)
+        offset += 5
+        if number := _NUMBERS.get(item_type):
+            return offset + length * number.size
+        for _ in range(length):
+            offset = _skip(data, offset, item_type)
+        return offset
+    if tag_type == TAG_COMPOUND:
+        while (item_type := data[offset]) != TAG_END:
+            offset += 3 + _STRING_LENGTH.unpack_from(data, offset + 1)[0]
+            offset = _skip(data, offset, item_type)
+        return offset + 1
+    if tag_type == TAG_END:
+        return offset
+    raise NbtError(f"Unknown tag type [{tag_type}]")
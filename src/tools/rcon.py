@@ -0,0 +1,190 @@
+import logging
+import socket
+import struct
+import threading
+from itertools import count
+from time import monotonic
+from typing import Iterator, List, Optional, Tuple
+
+SERVERDATA_RESPONSE_VALUE = 0
+SERVERDATA_EXECCOMMAND = 2
+SERVERDATA_AUTH = 3
+
+_HEADER = struct.Struct("<iii")
+
+
+class RconError(Exception):
+    pass
+
+
+def encode_packet(request_id: int, packet_type: int, payload: str) -> bytes:
+    body = payload.encode("utf-8") + b"\x00\x00"
+    return _HEADER.pack(8 + len(body), request_id, packet_type) + body
+
+
+def decode_packet(data: bytes) -> Tuple[int, int, str]:
+    request_id, packet_type = struct.unpack_from("<ii", data)
+    return request_id, packet_type, data[8:-2].decode("utf-8", errors="replace")
+
+
+class Exchange:
+    # One command on a connection, without I/O: the client sends `outgoing`,
+    # then feeds every packet it receives to receive() and sends what it
+    # returns, until `response` is set. A response may be split over several
+    # packets, so once the first one arrived an invalid packet type is sent as
+    # an end marker: it is answered after all the packets of the response.
+
+    def __init__(self, command: str, ids: Iterator[int]):
+        self._ids = ids
+        self._command_id = next(ids)
+        self._marker_id: Optional[int] = None
+        self._fragments: List[str] = []
+        self.outgoing = encode_packet(self._command_id, SERVERDATA_EXECCOMMAND, command)
+        self.response: Optional[str] = None
+
+    def receive(self, request_id: int, payload: str) -> bytes:
+        if request_id == self._marker_id:
+            self.response = "".join(self._fragments)
+        elif request_id == self._command_id:
+            self._fragments.append(payload)
+            if self._marker_id is None:
+                self._marker_id = next(self._ids)
+                return encode_packet(self._marker_id, SERVERDATA_RESPONSE_VALUE, "")
+        return b""
+
+
+class RconConnection:
+    def __init__(self, host: str, port: int, password: str, timeout: float):
+        self.timeout = timeout
+        self._ids = count(1)
+        self._socket = socket.create_connection((host, port), timeout=timeout)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        self.last_used = monotonic()
+        try:
+            self._login(password)
+        except (OSError, RconError):
+            self._socket.close()
+            raise
+
+    def close(self):
+        self._socket.close()
+
+    def command(self, command: str) -> str:
+        # Servers read one packet per read() and drop the connection when it
+        # holds more, so only one packet is in flight.
+        self._socket.settimeout(self.timeout)
+        response = self._exchange(command)
+        self.last_used = monotonic()
+        return response
+
+    def _exchange(self, command: str) -> str:
+        exchange = Exchange(command, self._ids)
+        data = exchange.outgoing
+        while exchange.response is None:
+            if data:
+                self._send(data)
+            request_id, _, payload = self._receive()
+            data = exchange.receive(request_id, payload)
+        return exchange.response
+
+    def _login(self, password: str):
+        self._send(encode_packet(next(self._ids), SERVERDATA_AUTH, password))
+        request_id, _, _ = self._receive()
+        if request_id == -1:
+            raise RconError("Authentication failed")
+
+    def _send(self, data: bytes):
+        self._socket.sendall(data)
+
+    def _receive(self) -> Tuple[int, int, str]:
+        (length,) = struct.unpack("<i", self._read(4))
+        return decode_packet(self._read(length))
+
+    def _read(self, size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            chunk = self._socket.recv(size - len(data))
+            if not chunk:
+                raise RconError("Connection closed by server")
+            data += chunk
+        return data
+
+
+class RconPool:
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        password: str,
+        size: int = 2,
+        timeout: float = 5.0,
+        max_idle: float = 300.0,
+        max_backoff: float = 60.0,
+    ):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_backoff = max_backoff
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle: List[RconConnection] = []
+        self._failures = 0
+        self._retry_at = 0.0
+
+    def command(self, command: str) -> Optional[str]:
+        if monotonic() < self._retry_at:
+            return None
+
+        with self._slots:
+            if connection := self._acquire():
+                try:
+                    return self._run(connection, command)
+                except (OSError, RconError):
+                    # closed by a server restart, retry on a fresh connection
+                    connection.close()
+            connection = None
+            try:
+                connection = self._connect()
+                return self._run(connection, command)
+            except (OSError, RconError) as e:
+                if connection:
+                    connection.close()
+                self._failed(e)
+                return None
+
+    def close(self):
+        with self._lock:
+            for connection in self._idle:
+                connection.close()
+            self._idle.clear()
+
+    def _connect(self) -> RconConnection:
+        return RconConnection(self.host, self.port, self.password, self.timeout)
+
+    def _run(self, connection: RconConnection, command: str) -> str:
+        response = connection.command(command)
+        self._release(connection)
+        return response
+
+    def _acquire(self) -> Optional[RconConnection]:
+        with self._lock:
+            while self._idle:
+                connection = self._idle.pop()
+                if monotonic() - connection.last_used < self.max_idle:
+                    return connection
+                connection.close()
+        return None
+
+    def _release(self, connection: RconConnection):
+        self._failures = 0
+        self._retry_at = 0.0
+        with self._lock:
+            self._idle.append(connection)
+
+    def _failed(self, error: Exception):
+        self._failures += 1
+        backoff = min(self.max_backoff, 2 ** (self._failures - 1))
+        self._retry_at = monotonic() + backoff
+        logging.error(f"Connection to RCON failed: {error} (retry in {backoff}s)")
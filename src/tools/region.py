@@ -0,0 +1,70 @@
+import gzip
+import mmap
+import os
+import struct
+import zlib
+from array import array
+from time import time
+from typing import Iterator, NamedTuple, Tuple
+
+# Anvil region files (.mca): a header of 1024 chunk locations (offset in 4 KiB
+# sectors << 8 | sector count) then 1024 modification times, both big-endian,
+# followed by the chunks: length, compression type and compressed NBT.
+
+SECTOR = 4096
+HEADER_SIZE = 2 * SECTOR
+_HEADER = struct.Struct(">1024I1024I")
+_CHUNK_HEADER = struct.Struct(">IB")
+
+# types above 128 are chunks stored in an external .mcc file
+_DECOMPRESS = {1: gzip.decompress, 2: zlib.decompress, 3: bytes}
+
+
+class RegionHeader(NamedTuple):
+    chunks: int
+    size: int
+    # sorted modification times of the chunks saved in the recent window when
+    # the header was read, older chunks only get older until the file changes
+    recent: array
+
+
+def read_region_header(path: str, recent_seconds: float) -> RegionHeader:
+    with open(path, "rb") as fd:
+        size = os.fstat(fd.fileno()).st_size
+        if size < HEADER_SIZE:
+            # created, no chunk saved yet
+            return RegionHeader(0, size, array("I"))
+        with mmap.mmap(fd.fileno(), HEADER_SIZE, access=mmap.ACCESS_READ) as view:
+            header = _HEADER.unpack_from(view)
+    since = time() - recent_seconds
+    locations, timestamps = header[:1024], header[1024:]
+    chunks = sum(1 for location in locations if location)
+    recent = sorted(
+        timestamp
+        for location, timestamp in zip(locations, timestamps)
+        if location and timestamp >= since
+    )
+    return RegionHeader(chunks, size, array("I", recent))
+
+
+def read_region_chunks(path: str) -> Iterator[Tuple[int, bytes]]:
+    # (compression type, compressed data) of each chunk, only the sectors of
+    # the chunks are read from the mapped file
+    with open(path, "rb") as fd:
+        size = os.fstat(fd.fileno()).st_size
+        if size < HEADER_SIZE:
+            return
+        with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            for location in _HEADER.unpack_from(view)[:1024]:
+                offset = (location >> 8) * SECTOR
+                if not location or offset + _CHUNK_HEADER.size > size:
+                    continue
+                length, compression = _CHUNK_HEADER.unpack_from(view, offset)
+                start = offset + _CHUNK_HEADER.size
+                yield compression, view[start : offset + 4 + length]
+
+
+def decompress_chunk(compression: int, data: bytes) -> bytes:
+    if (decompress := _DECOMPRESS.get(compression)) is None:
+        raise ValueError(f"Unsupported chunk compression [{compression}]")
+    return decompress(data)
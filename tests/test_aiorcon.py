@@ -0,0 +1,120 @@
+import asyncio
+from time import monotonic
+
+import pytest
+
+from bench.fake_rcon import AsyncFakeRconServer, responses
+from src.tools.aiorcon import AsyncRconClient
+from src.tools.rcon import RconError
+
+TABLE = responses(players=20, online=3, mods=400)
+
+
+async def respond(command: str) -> str:
+    if command == "/hang":
+        await asyncio.Event().wait()
+    if command == "/slow":
+        await asyncio.sleep(0.3)
+    return TABLE.get(command, "Unknown command")
+
+
+def run(test):
+    # each test gets its own loop, server and clients
+    async def main():
+        server = await AsyncFakeRconServer("password", respond).start()
+        try:
+            await test(server)
+        finally:
+            await server.close()
+
+    asyncio.run(main())
+
+
+def make_client(server, password="password", timeout=2.0) -> AsyncRconClient:
+    return AsyncRconClient("127.0.0.1", server.port, password, timeout=timeout)
+
+
+def test_split_response():
+    async def test(server):
+        client = make_client(server)
+        response = await client.command("/forge mods")
+        assert response == TABLE["/forge mods"]
+        assert server.rejected == 0
+        await client.close()
+
+    run(test)
+
+
+def test_concurrent_commands_share_one_connection():
+    async def test(server):
+        client = make_client(server)
+        commands = ["/list", "/forge entity list", "/forge mods"] * 3
+        results = await asyncio.gather(*map(client.command, commands))
+        assert results == [TABLE[command] for command in commands]
+        assert server.connections == 1
+        assert server.rejected == 0
+        await client.close()
+
+    run(test)
+
+
+def test_targets_run_concurrently():
+    async def test(server):
+        clients = [make_client(server) for _ in range(3)]
+        start = monotonic()
+        await asyncio.gather(*(client.command("/slow") for client in clients))
+        # one connection each, the commands did not wait for each other
+        assert monotonic() - start < 0.6
+        assert server.connections == 3
+        for client in clients:
+            await client.close()
+
+    run(test)
+
+
+def test_timeout_reconnects():
+    async def test(server):
+        client = make_client(server, timeout=0.2)
+        with pytest.raises(asyncio.TimeoutError):
+            await client.command("/hang")
+        assert await client.command("/list") == TABLE["/list"]
+        assert server.connections == 2
+        await client.close()
+
+    run(test)
+
+
+def test_hung_command_does_not_block_the_next_ones_forever():
+    async def test(server):
+        client = make_client(server, timeout=0.2)
+        hung, listed = await asyncio.gather(
+            client.command("/hang"), client.command("/list"), return_exceptions=True
+        )
+        assert isinstance(hung, asyncio.TimeoutError)
+        assert listed == TABLE["/list"]
+        await client.close()
+
+    run(test)
+
+
+def test_reconnect_after_connection_lost():
+    async def test(server):
+        client = make_client(server)
+        assert await client.command("/list") == TABLE["/list"]
+        # a server restart closes the connection
+        server.drop_connections()
+        assert await client.command("/list") == TABLE["/list"]
+        assert server.connections == 2
+        await client.close()
+
+    run(test)
+
+
+def test_authentication_failure():
+    async def test(server):
+        client = make_client(server, password="wrong")
+        with pytest.raises(RconError):
+            await client.command("/list")
+        await client.close()
+
+    run(test)
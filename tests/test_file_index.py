@@ -0,0 +1,21 @@
+import json
+import logging
+
+from src.tools.file_index import DirectoryIndex
+from src.tools.json_reader import read_json
+
+
+def test_missing_directory_is_logged_once(tmp_path, caplog):
+    directory = tmp_path / "advancements"
+    index = DirectoryIndex(str(directory), ".json", read_json)
+    with caplog.at_level(logging.INFO):
+        for _ in range(3):
+            assert index.refresh() == (set(), set())
+        assert [record.levelname for record in caplog.records] == ["ERROR"]
+
+        # picked up as soon as it exists
+        directory.mkdir()
+        (directory / "player.json").write_text(json.dumps({"done": True}))
+        assert index.refresh() == ({"player"}, set())
+        assert index["player"] == {"done": True}
+        assert caplog.records[-1].getMessage().endswith("found")
@@ -0,0 +1,140 @@
+import gzip
+
+import pytest
+
+from bench.genworld import write_nbt
+from src.tools.nbt_reader import (
+    TAG_BYTE,
+    TAG_BYTE_ARRAY,
+    TAG_COMPOUND,
+    TAG_DOUBLE,
+    TAG_FLOAT,
+    TAG_INT,
+    TAG_INT_ARRAY,
+    TAG_LIST,
+    TAG_LONG,
+    TAG_LONG_ARRAY,
+    TAG_SHORT,
+    TAG_STRING,
+    NbtError,
+    read_nbt_tags,
+    scan_nbt_list_lengths,
+    scan_nbt_tags,
+)
+
+ITEM = {"id": (TAG_STRING, "minecraft:stone"), "Count": (TAG_BYTE, 64)}
+
+LEVEL = {
+    "Data": (
+        TAG_COMPOUND,
+        {
+            "Version": (
+                TAG_COMPOUND,
+                {
+                    "Name": (TAG_STRING, "1.20.1"),
+                    "Id": (TAG_INT, 3465),
+                    "Snapshot": (TAG_BYTE, 0),
+                },
+            ),
+            "Difficulty": (TAG_BYTE, 2),
+            "Time": (TAG_LONG, 123456789),
+        },
+    ),
+    # skipped over by the scans below
+    "Inventory": (TAG_LIST, (TAG_COMPOUND, [ITEM, ITEM, ITEM])),
+    "Pos": (TAG_LIST, (TAG_DOUBLE, [1.5, 64.0, -3.25])),
+    "Heightmap": (TAG_LONG_ARRAY, [1, 2, 3, 4]),
+    "Biomes": (TAG_INT_ARRAY, [7] * 16),
+    "Light": (TAG_BYTE_ARRAY, [-1, 0, 1]),
+    "Nested": (TAG_LIST, (TAG_LIST, [(TAG_SHORT, [1, 2]), (TAG_SHORT, [3])])),
+    "Health": (TAG_FLOAT, 20.0),
+    "foodLevel": (TAG_INT, 18),
+}
+
+
+@pytest.fixture
+def level(tmp_path) -> str:
+    path = str(tmp_path / "level.dat")
+    write_nbt(path, LEVEL)
+    return path
+
+
+def raw(path: str) -> bytes:
+    with gzip.open(path) as fd:
+        return fd.read()
+
+
+def test_nested_paths(level):
+    tags = ("Data.Version.Name", "Data.Version.Id", "Data.Difficulty", "Data.Time")
+    assert read_nbt_tags(level, tags) == {
+        "Data.Version.Name": "1.20.1",
+        "Data.Version.Id": 3465,
+        "Data.Difficulty": 2,
+        "Data.Time": 123456789,
+    }
+
+
+def test_values(level):
+    tags = ("Pos", "Heightmap", "Inventory", "Nested", "Health")
+    assert read_nbt_tags(level, tags) == {
+        "Pos": [1.5, 64.0, -3.25],
+        "Heightmap": [1, 2, 3, 4],
+        "Inventory": [{"id": "minecraft:stone", "Count": 64}] * 3,
+        "Nested": [[1, 2], [3]],
+        "Health": 20.0,
+    }
+
+
+def test_missing_tags_are_absent(level):
+    tags = ("Data.Version.Name", "Data.Missing", "Data.Version.Series", "Missing.Tag")
+    assert read_nbt_tags(level, tags) == {"Data.Version.Name": "1.20.1"}
+    # a requested compound of another type is skipped
+    assert read_nbt_tags(level, ("Health.Value", "foodLevel")) == {"foodLevel": 18}
+
+
+def test_skips_lists_of_compounds_and_arrays(level):
+    # every other tag is skipped over to reach the last one
+    assert read_nbt_tags(level, ("foodLevel",)) == {"foodLevel": 18}
+
+
+def test_stops_once_every_tag_was_read(level):
+    data = raw(level)
+    end = data.index(b"Snapshot")
+    # nothing after the last requested tag is read, even in a nested compound
+    assert scan_nbt_tags(data[:end], ("Data.Version.Name", "Data.Version.Id")) == {
+        "Data.Version.Name": "1.20.1",
+        "Data.Version.Id": 3465,
+    }
+    # a nested compound left early is skipped to read the next tags
+    end = data.index(b"Inventory")
+    assert scan_nbt_tags(data[:end], ("Data.Version.Name", "Data.Time")) == {
+        "Data.Version.Name": "1.20.1",
+        "Data.Time": 123456789,
+    }
+
+
+def test_list_lengths(level):
+    tags = ("Inventory", "Pos", "Nested", "Missing")
+    assert scan_nbt_list_lengths(raw(level), tags) == {
+        "Inventory": 3,
+        "Pos": 3,
+        "Nested": 2,
+    }
+    with pytest.raises(NbtError):
+        scan_nbt_list_lengths(raw(level), ("Health",))
+
+
+@pytest.mark.parametrize("tag", ["Data.Time", "foodLevel"])
+def test_truncated_data(level, tmp_path, tag):
+    data = raw(level)
+    for end in (1, len(data) // 2, len(data) - 1):
+        # uncompressed files are read as is
+        path = tmp_path / "truncated.dat"
+        path.write_bytes(data[:end])
+        with pytest.raises(NbtError):
+            read_nbt_tags(str(path), (tag, "Missing"))
+
+
+def test_root_is_not_a_compound():
+    with pytest.raises(NbtError):
+        scan_nbt_tags(bytes((TAG_LIST,)), ("Data",))
@@ -0,0 +1,155 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.core.player_stats import classify, server_stats_metrics, stat_keys
+from src.core.stats_store import PlayerStats, StatTotals, read_player_stats
+
+
+def key_after_1_13(category: str, name: str):
+    ((key, _),) = read_player_stats({"stats": {category: {name: 1}}})
+    return key
+
+
+def key_before_1_13(name: str):
+    ((key, _),) = read_player_stats({name: 1})
+    return key
+
+
+# (category, name) in a 1.13+ stats file, stat name before 1.13 (None when
+# not tested), sample
+CLASSIFIED = [
+    (
+        ("minecraft:mined", "minecraft:stone"),
+        "stat.mineBlock.minecraft.stone",
+        ("mined", ("minecraft", "stone"), False),
+    ),
+    (
+        ("minecraft:crafted", "create:cogwheel"),
+        "stat.craftItem.create.cogwheel",
+        ("crafted", ("create", "cogwheel"), False),
+    ),
+    (
+        ("minecraft:picked_up", "minecraft:dirt"),
+        "stat.pickup.minecraft.dirt",
+        ("picked_up", ("minecraft", "dirt"), False),
+    ),
+    # entity names were capitalized before 1.13
+    (
+        ("minecraft:killed", "minecraft:zombie"),
+        None,
+        ("killed", ("minecraft", "zombie"), False),
+    ),
+    (
+        None,
+        "stat.killEntity.Zombie",
+        ("killed", ("minecraft", "Zombie"), False),
+    ),
+    (
+        ("minecraft:killed_by", "minecraft:creeper"),
+        None,
+        ("killed_by", ("minecraft", "creeper"), False),
+    ),
+    (
+        None,
+        "stat.entityKilledBy.Creeper",
+        ("killed_by", ("minecraft", "Creeper"), False),
+    ),
+    (
+        ("minecraft:custom", "minecraft:deaths"),
+        "stat.deaths",
+        ("deaths", (), False),
+    ),
+    (
+        ("minecraft:custom", "minecraft:jump"),
+        "stat.jump",
+        ("jump", (), False),
+    ),
+    (
+        ("minecraft:custom", "minecraft:walk_one_cm"),
+        "stat.walkOneCm",
+        ("distance", ("walk",), False),
+    ),
+    (
+        ("minecraft:custom", "minecraft:time_since_death"),
+        "stat.timeSinceDeath",
+        ("time", ("since_death",), True),
+    ),
+    (
+        ("minecraft:custom", "minecraft:play_time"),
+        "stat.playOneMinute",
+        ("time", ("played",), True),
+    ),
+    (
+        ("minecraft:custom", "minecraft:sneak_time"),
+        "stat.sneakTime",
+        ("time", ("sneak",), True),
+    ),
+    (
+        ("minecraft:custom", "minecraft:open_chest"),
+        "stat.chestOpened",
+        ("interact", ("chest",), False),
+    ),
+    (
+        ("minecraft:custom", "minecraft:interact_with_crafting_table"),
+        "stat.craftingTableInteraction",
+        ("interact", ("crafting_table",), False),
+    ),
+    (
+        ("minecraft:custom", "minecraft:clean_armor"),
+        "stat.armorCleaned",
+        ("clean", ("armor",), False),
+    ),
+    (
+        ("minecraft:custom", "minecraft:fill_cauldron"),
+        "stat.cauldronFilled",
+        ("fill_cauldron", (), False),
+    ),
+    (
+        ("minecraft:custom", "minecraft:enchant_item"),
+        "stat.itemEnchanted",
+        ("enchant_item", (), False),
+    ),
+]
+
+
+@pytest.mark.parametrize("after, before, sample", CLASSIFIED)
+def test_classify(after, before, sample):
+    if after:
+        assert classify(key_after_1_13(*after)) == sample
+    if before:
+        assert classify(key_before_1_13(before)) == sample
+
+
+@pytest.mark.parametrize(
+    "key",
+    [
+        # ignored
+        key_after_1_13("minecraft:custom", "minecraft:drop"),
+        key_before_1_13("stat.drop"),
+        # unknown
+        key_after_1_13("minecraft:unknown", "minecraft:stone"),
+        key_after_1_13("minecraft:custom", "minecraft:unknown_stat"),
+        key_before_1_13("stat.unknownStat"),
+        key_before_1_13("stat.unknownCategory.minecraft.stone"),
+    ],
+)
+def test_not_exported(key):
+    assert classify(key) is None
+
+
+def test_ticks_are_exported_in_seconds():
+    totals = StatTotals(stat_keys)
+    for stats in (
+        {"minecraft:play_time": 72000, "minecraft:jump": 30},
+        {"minecraft:play_time": 36000, "minecraft:jump": 12},
+    ):
+        player_stats = PlayerStats.build(
+            stat_keys, read_player_stats({"stats": {"minecraft:custom": stats}})
+        )
+        totals.update(None, None, player_stats)
+    metrics = server_stats_metrics(SimpleNamespace(stat_totals=totals))
+    (time,) = metrics["time"].samples
+    assert (time.labels, time.value) == ({"action": "played"}, 5400)
+    (jump,) = metrics["jump"].samples
+    assert jump.value == 42
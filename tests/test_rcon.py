@@ -0,0 +1,93 @@
+import socket
+from itertools import count
+
+import pytest
+
+from bench.fake_rcon import MAX_PAYLOAD, serve
+from src.tools.rcon import (
+    SERVERDATA_AUTH,
+    SERVERDATA_EXECCOMMAND,
+    SERVERDATA_RESPONSE_VALUE,
+    Exchange,
+    RconPool,
+    decode_packet,
+    encode_packet,
+)
+
+
+@pytest.fixture
+def server():
+    server = serve(players=20, online=3, mods=400)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_pool(server, password="password") -> RconPool:
+    return RconPool("127.0.0.1", server.server_address[1], password, timeout=2)
+
+
+def test_exchange_sends_the_marker_after_the_first_packet():
+    exchange = Exchange("/list", count(1))
+    assert decode_packet(exchange.outgoing[4:]) == (1, SERVERDATA_EXECCOMMAND, "/list")
+    marker = exchange.receive(1, "part 1, ")
+    assert decode_packet(marker[4:]) == (2, SERVERDATA_RESPONSE_VALUE, "")
+    # only one marker, packets of other requests are ignored
+    assert exchange.receive(1, "part 2") == b""
+    assert exchange.receive(7, "stale") == b""
+    assert exchange.response is None
+    assert exchange.receive(2, "Unknown request 0") == b""
+    assert exchange.response == "part 1, part 2"
+
+
+def test_fake_server_drops_several_packets_in_one_read(server):
+    # the framing of the vanilla server, pipelined packets close the connection
+    with socket.create_connection(server.server_address, timeout=2) as connection:
+        connection.sendall(
+            encode_packet(1, SERVERDATA_AUTH, "password")
+            + encode_packet(2, SERVERDATA_EXECCOMMAND, "/list")
+        )
+        assert connection.recv(4096) == b""
+    assert server.rejected == 1
+
+
+def test_command(server):
+    pool = make_pool(server)
+    response = pool.command("/list")
+    assert response.startswith("There are 3 of a max of 20 players online")
+    assert server.rejected == 0
+
+
+def test_commands_share_one_connection(server):
+    pool = make_pool(server)
+    for _ in range(3):
+        for command in ("/list", "/forge entity list", "/forge mods"):
+            assert pool.command(command) is not None
+    assert server.connections == 1
+    assert server.commands == 9
+    assert server.rejected == 0
+
+
+def test_split_response(server):
+    response = make_pool(server).command("/forge mods")
+    assert len(response) > 2 * MAX_PAYLOAD
+    assert response.startswith("Mod List:\nmod0: mod0 (1.0.0)")
+    assert response.endswith("mod399: mod399 (1.0.399)")
+
+
+def test_authentication_failure_backs_off(server):
+    pool = make_pool(server, password="wrong")
+    assert pool.command("/list") is None
+    # the next command waits for the backoff instead of connecting again
+    assert pool.command("/list") is None
+    assert server.connections == 1
+
+
+def test_reconnect_after_connection_lost(server):
+    pool = make_pool(server)
+    assert pool.command("/list") is not None
+    # a server restart closes the idle connection
+    for connection in pool._idle:
+        connection._socket.shutdown(socket.SHUT_RDWR)
+    assert pool.command("/list") is not None
+    assert server.connections == 2
@@ -0,0 +1,24 @@
+import os
+
+from src.core.server_log import ServerLog
+
+JOIN = "[12:00:00] [Server thread/INFO]: Steve joined the game\n"
+LEAVE = "[12:05:00] [Server thread/INFO]: Steve left the game\n"
+DEATH = "[12:01:00] [Server thread/INFO]: Steve fell from a high place\n"
+
+
+def test_events_count_from_the_start_of_the_current_log(tmp_path):
+    path = tmp_path / "latest.log"
+    path.write_text(JOIN + DEATH)
+    server_log = ServerLog(str(path), reconcile_interval=60)
+    server_log.refresh()
+    # written before the exporter started
+    assert server_log.online == {"Steve"}
+    assert server_log.events == {"join": 1, "leave": 0, "death": 1, "advancement": 0}
+
+    # rotated by a restart, the counts go on
+    os.rename(path, tmp_path / "old.log")
+    path.write_text(JOIN + LEAVE)
+    server_log.refresh()
+    assert server_log.online == set()
+    assert server_log.events == {"join": 2, "leave": 1, "death": 1, "advancement": 0}